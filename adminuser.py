@@ -29,13 +29,16 @@ parser.add_argument("-r", "--roles", nargs='+', dest= "roles",
 
 args = parser.parse_args()
 
-from dal.membership import MembershipStore
-from bll.membership import MembershipProvider
+import asyncio
+from app import configuration
+from dal import bootstrap, close_pg
+from dal.batching import flush_batchers
+from bll.admin.membership import AdminMembershipProvider
 
 # instantiate the membership provider
-membership = MembershipProvider(store=MembershipStore())
+membership = AdminMembershipProvider()
 
-def main(options):
+async def main(options):
     if not options.operation:
         options.operation = "add"
 
@@ -48,12 +51,12 @@ def main(options):
             print("error: argument -p/--password is required")
             return
 
-        success, result = membership.create_account(options.userkey, options.password, None, options.roles)
+        success, result = await membership.create_account(options.userkey, options.password, None, options.roles)
         if success:
             print("Account created successfully")
 
     elif options.operation == "delete":
-        success, result = membership.delete_account(operations.userkey)
+        success, result = await membership.delete_account(options.userkey)
         if success:
             print("Account deleted successfully")
 
@@ -63,7 +66,7 @@ def main(options):
             print("error: argument -r/--roles is required")
             return
 
-        success, result = membership.update_account(options.userkey, {
+        success, result = await membership.update_account(options.userkey, {
             "roles": options.roles
         })
         if success:
@@ -75,11 +78,20 @@ def main(options):
             print("error: argument -p/--password is required")
             return
 
-        success, result = membership.update_password(options.userkey, options.password)
+        success, result = await membership.update_password(options.userkey, options.password)
         if success:
             print("Account password updated successfully")
 
     if not success:
         print("ERROR: " + result)
 
-main(args)
+async def run(options):
+    loop = asyncio.get_event_loop()
+    await bootstrap(configuration, loop)
+    try:
+        await main(options)
+    finally:
+        await flush_batchers()
+        await close_pg()
+
+asyncio.get_event_loop().run_until_complete(run(args))
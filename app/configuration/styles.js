@@ -0,0 +1,28 @@
+/**
+ * Copyright 2016, Roberto Prevato roberto.prevato@gmail.com
+ *
+ * Configuration file for CSS resources.
+ * This file is read by the Python application, to generate <link> tags for stylesheets;
+ * stylesheets of areas are compiled from .less files by Grunt.
+ */
+module.exports = {
+
+  "sets": {
+
+    "libs": [
+      "styles/libs/font-awesome/css/font-awesome.min.css"
+    ],
+
+    "public": [
+      "styles/public.css"
+    ],
+
+    "admin": [
+      "styles/admin.css"
+    ],
+
+    "admin-login": [
+      "styles/adminlogin.css"
+    ]
+  }
+};
@@ -0,0 +1,148 @@
+"""
+ This module contains the admission control middleware, that limits the number of requests handled concurrently by
+ each area of the application.
+
+ Requests exceeding the limit wait in a bounded queue, for a limited time; when the queue is full, or the wait times
+ out, requests are rejected immediately with 503 Service Unavailable and a Retry-After header. This way, when the
+ database slows down, latency stays bounded and the service degrades predictably, instead of accumulating requests.
+"""
+import asyncio
+from collections import deque
+from app import configuration
+from app.responses import service_unavailable
+
+
+admission_defaults = {
+    "max_in_flight": 100,  # requests handled concurrently
+    "max_queue": 100,  # requests waiting to be handled
+    "queue_timeout": 1.0,  # seconds a request can wait in queue
+    "retry_after": 1  # seconds, suggested to rejected clients
+}
+
+
+class AdmissionController:
+    """
+    Limits the number of requests handled concurrently, with a bounded queue of waiting requests.
+    """
+    def __init__(self, name, max_in_flight, max_queue, queue_timeout, retry_after, loop=None):
+        if max_in_flight <= 0:
+            raise ValueError("The maximum number of requests in flight must be greater than zero.")
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.loop = loop
+        self.in_flight = 0
+        self.queue = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def admit(self):
+        """
+        Waits for the admission of a request; returns False if the request must be rejected.
+        Admitted requests must be released with the release method.
+        """
+        if self.in_flight < self.max_in_flight and not self.queue:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self.queue) >= self.max_queue:
+            self.rejected += 1
+            return False
+        future = asyncio.Future(loop=self.loop)
+        self.queue.append(future)
+        try:
+            await asyncio.wait([future], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if not future.done():
+            self._abandon(future)
+            self.timed_out += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def _abandon(self, future):
+        if future.done() and not future.cancelled():
+            # the request was admitted in the meantime: admit the next one
+            self.release()
+            return
+        future.cancel()
+        try:
+            self.queue.remove(future)
+        except ValueError:
+            pass
+
+    def release(self):
+        """
+        Releases an admitted request, admitting the first waiting request.
+        """
+        self.in_flight -= 1
+        while self.queue and self.in_flight < self.max_in_flight:
+            future = self.queue.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self.queue),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out
+        }
+
+
+def get_admission_options(area_name):
+    """
+    Returns the admission options of an area: the ones defined by the area override the global ones.
+    """
+    options = dict(admission_defaults)
+    for conf in (configuration.get("admission"), configuration.areas[area_name].get("admission")):
+        if conf:
+            options.update(conf)
+    return options
+
+
+def setup_admission(app, area_names):
+    """
+    Configures admission control for the given areas of the application.
+
+    :param app: application.
+    :param area_names: names of the areas whose requests are limited.
+    """
+    controllers = {}
+    for area_name in area_names:
+        options = get_admission_options(area_name)
+        controllers[area_name] = AdmissionController(area_name,
+                                                     options["max_in_flight"],
+                                                     options["max_queue"],
+                                                     options["queue_timeout"],
+                                                     options["retry_after"],
+                                                     loop=app.loop)
+    app["admission"] = controllers
+    # the admission middleware is the first one, so rejected requests cost as little as possible
+    app.middlewares.insert(0, admission_middleware)
+
+
+async def admission_middleware(app, handler):
+    controllers = app["admission"]
+
+    async def admission_middleware_handler(request):
+        # the middleware is the outermost one, so it receives the handler of the next middleware: the area is read from
+        # the handler of the matched route. Handlers decorated by an Area have an area attribute; other handlers
+        # (e.g. static files) are not limited
+        controller = controllers.get(getattr(request.match_info.handler, "area", None))
+        if controller is None:
+            return await handler(request)
+        if not await controller.admit():
+            return service_unavailable(controller.retry_after)
+        try:
+            return await handler(request)
+        finally:
+            controller.release()
+    return admission_middleware_handler
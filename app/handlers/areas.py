@@ -3,15 +3,32 @@
 
  This module contains functions for the organization of code into logical areas.
 """
+import calendar
+import logging
+import uuid
+from datetime import datetime
 from functools import wraps, partial
-from aiohttp.web import Request, HTTPFound, HTTPForbidden, HTTPUnauthorized
+from aiohttp.web import Request, Response, HTTPException, HTTPFound, HTTPForbidden, HTTPUnauthorized
 from app import configuration
 from core import require_params
 from core.encryption.aes import AesEncryptor
+from core.encryption.signing import Signer
+from core.encryption.tokens import TokenSerializer
+from bll.sessiondata import SessionData
+from dal.routing import reset_routing
 from .cookies import CookieToken
-from .localization import get_text, get_best_culture, InvalidCultureException
+from .localization import get_text, get_best_culture, get_area_cultures, InvalidCultureException
+from .responsecache import ResponseCache, CACHEABLE_METHODS, AntiforgeryPlaceholder, get_response, \
+    replace_placeholder
 from .security.antiforgery import issue_aft, validate_aft, InvalidAntiforgeryTokenException
+
+
+logger = logging.getLogger(__name__)
+
 request_context_key = "aiohttp_jinja2_context"
+# kinds of session cookie tokens
+session_token_kind = "s"
+anonymous_token_kind = "a"
 
 
 class Area:
@@ -44,6 +61,15 @@ class Area:
         self.config = area_config
         self.secure_cookies = configuration.secure_cookies
         self.membership = membership_provider
+        # session cookies are authenticated tokens: the key is derived once, and invalid cookies are rejected
+        # before any database query
+        self.session_tokens = TokenSerializer(area_config.get("encryption_key"), "session-cookie") \
+            if membership_provider else None
+        self.antiforgery_signer = Signer(area_config.get("encryption_key"), "antiforgery") \
+            if membership_provider else None
+        # whether AES encrypted session cookies, issued by previous versions, are still accepted (and reissued)
+        self.accept_legacy_cookies = area_config.get("accept_legacy_session_cookies", True)
+        self.cultures = get_area_cultures(name)
 
     def get_fallback_url(self, request):
         """
@@ -83,6 +109,42 @@ class Area:
             return wrapped
         return decorator
 
+    def cache(self, ttl=None, maxsize=None):
+        """
+        Caches the responses of a request handler for anonymous users, by path, culture and cache seed; cached
+        responses are served without rendering. Must be applied after the area decorator.
+
+        :param ttl: seconds a response is kept in cache.
+        :param maxsize: maximum number of cached responses.
+        :return: decorated function.
+        """
+        def decorator(f):
+            f.response_cache = ResponseCache(ttl, maxsize)
+            return f
+        return decorator
+
+    async def _get_cached_response(self, request, f, response_cache):
+        """
+        Returns the response of a request handler from cache, rendering and storing it on cache miss.
+        Pages are rendered with a placeholder instead of the antiforgery token, replaced at each hit; handlers must
+        return a web.Response when they use the placeholder, since other responses cannot be modified once sent.
+        """
+        antiforgery = partial(issue_aft, request, self.antiforgery_signer) if self.membership else None
+        cached = response_cache.get(request)
+        if cached is None:
+            context = request[request_context_key]
+            placeholder = AntiforgeryPlaceholder(antiforgery)
+            context["antiforgery"] = placeholder
+            response = await f(request)
+            context["antiforgery"] = antiforgery
+            if placeholder.used and not isinstance(response, Response):
+                raise RuntimeError("Handlers with cached responses must return a web.Response, "
+                                   "or stream their pages with stream_template")
+            cached = response_cache.store(request, response)
+            if cached is None:
+                return replace_placeholder(response, antiforgery)
+        return get_response(request, cached, antiforgery)
+
     @staticmethod
     def get_client_ip(request):
         peername = request.transport.get_extra_info("peername")
@@ -99,10 +161,14 @@ class Area:
 
         :param request: a new request object
         """
-        # validate the antiforgery token, if necessary
-        validate_aft(request)
-
         await self._authenticate_user(request)
+        if self.membership:
+            # used by streamed responses, to save session data before sending the headers
+            request.save_session_data = partial(self.save_session_data, request)
+
+        # validate the antiforgery token, if necessary (tokens are session specific)
+        await validate_aft(request, self.antiforgery_signer)
+
         self._apply_localization(request)
 
         # set the request context key; used by Jinja2 Rendering engine (due to aiohttp-jinja2 implementation)
@@ -110,34 +176,154 @@ class Area:
         request[request_context_key] = {
             "user": request.user,
             "culture": request.culture,
-            "antiforgery": partial(issue_aft, request),
+            "antiforgery": partial(issue_aft, request, self.antiforgery_signer),
             "_": partial(get_text, request.culture)  # function for localization of strings inside template
         }
 
     async def initialize_anonymous_session(self, request: Request):
         """
         Initializes an anonymous session for the given request.
+        If the membership provider uses lazy anonymous sessions, the session is represented by a signed cookie and
+        is not stored in the persistence layer, until something requires it (see persist_session).
 
         :param request: incoming request to a resource that is related to this logical area.
         """
-        client_ip = self.get_client_ip(request)
-        result = await self.membership.initialize_anonymous_session(client_ip,
-                                                                    client_data=request.headers.get("User-Agent"))
+        if self.membership.options.lazy_anonymous_sessions:
+            result = self.membership.initialize_transient_session()
+            session_cookie_value = self._get_anonymous_token(result.session)
+        else:
+            client_ip = self.get_client_ip(request)
+            result = await self.membership.initialize_anonymous_session(client_ip,
+                                                                        client_data=request.headers.get("User-Agent"))
+            session_cookie_value = self._get_session_token(result.session)
+
+        self._set_session_cookie(request, session_cookie_value)
+        # store user and session information in the request object
+        request.user = result.principal
+        request.session = result.session
 
-        # set a flag to set a session cookie
-        session = result.session
-        session_cookie_name = self.config.session_cookie_name
-        encryption_key = self.config.encryption_key
-        session_cookie_value = AesEncryptor.encrypt(str(session.guid), encryption_key)
+    async def persist_session(self, request: Request):
+        """
+        Ensures that the session of the given request is stored in the persistence layer; to be used when something
+        requires server side state for an anonymous user. The session keeps its guid, so tokens issued for it remain
+        valid.
+
+        :param request: request of which the session must be persisted.
+        """
+        session = request.session
+        if not session.transient:
+            return session
+        await self.membership.materialize_session(session,
+                                                  self.get_client_ip(request),
+                                                  request.headers.get("User-Agent"))
+        self._set_session_cookie(request, self._get_session_token(session))
+        return session
+
+    async def sign_in(self, request: Request, result):
+        """
+        Applies the result of a successful login to the given request: the session cookie is replaced with the one of
+        the new session, and the previous anonymous session is destroyed.
+
+        :param request: request that performed the login.
+        :param result: authentication result returned by the membership provider.
+        """
+        previous_session = getattr(request, "session", None)
+        if previous_session is not None and previous_session.anonymous and not previous_session.transient:
+            await self.membership.destroy_session(previous_session.guid)
+
+        self._set_session_cookie(request, self._get_session_token(result.session))
+        request.user = result.principal
+        request.session = result.session
+        # antiforgery tokens are session specific
+        request.aft = None
+
+    async def get_session_data(self, request: Request):
+        """
+        Returns the server side data of the request session, loading it on first access.
+        Modified session data is saved once, after the request handler completes.
+
+        :param request: request of which session data is required.
+        :return: SessionData
+        """
+        data = getattr(request, "session_data", None)
+        if data is None:
+            session = request.session
+            if session.transient:
+                # nothing can be stored for a transient session
+                data = SessionData()
+            else:
+                data = await self.membership.get_session_data(session.guid)
+            request.session_data = data
+        return data
+
+    async def save_session_data(self, request: Request):
+        """
+        Saves the session data of the given request, if it was loaded and modified.
+        A transient anonymous session is persisted first: this is not possible once the response is prepared (e.g. a
+        streamed response), since its session cookie could not be sent.
 
+        :param request: request of which session data must be saved.
+        """
+        data = getattr(request, "session_data", None)
+        if data is None or not data.modified:
+            return
+        if request.session.transient and getattr(request, "response_prepared", False):
+            # a new session cannot be created: its cookie could not be sent
+            logger.error("The data of a transient session was modified after the response was prepared, and is "
+                         "not saved: %s", request.path)
+            return
+        await self.persist_session(request)
+        await self.membership.save_session_data(request.session.guid, data)
+        data.modified = False
+
+    def _set_session_cookie(self, request, session_cookie_value):
+        # set a flag to set a session cookie
         request.set_session_cookie = True
-        request.cookies_to_set.append(CookieToken(session_cookie_name,
+        request.cookies_to_set.append(CookieToken(self.config.session_cookie_name,
                                                   session_cookie_value,
                                                   httponly=True,
                                                   secure=self.secure_cookies))
-        # store user and session information in the request object
-        request.user = result.principal
-        request.session = session
+
+    def _get_session_token(self, session):
+        """
+        Returns the token of a stored session, used as session cookie value.
+        """
+        return self.session_tokens.dumps(session_token_kind, str(session.guid))
+
+    def _get_anonymous_token(self, session):
+        """
+        Returns a self-contained token describing a transient anonymous session.
+        """
+        expiration = calendar.timegm(session.expiration.utctimetuple())
+        return self.session_tokens.dumps(anonymous_token_kind, "{}:{}".format(session.guid.hex, expiration))
+
+    @staticmethod
+    def _read_anonymous_token(value):
+        """
+        Returns the guid and the expiration of a transient anonymous session from the value of its token;
+        or None, None if the value is not valid.
+        """
+        try:
+            guid, expiration = value.split(":")
+            return uuid.UUID(guid), datetime.utcfromtimestamp(int(expiration))
+        except ValueError:
+            return None, None
+
+    def _read_legacy_cookie(self, session_key):
+        """
+        Returns the session guid of an AES encrypted session cookie, issued by previous versions; None if the cookie
+        cannot be decrypted, or if it does not contain a guid: AES encryption has no integrity check, so tampered
+        cookies can decrypt to any value.
+        """
+        if not self.accept_legacy_cookies or TokenSerializer.is_token(session_key):
+            return None
+        success, session_guid = AesEncryptor.try_decrypt(session_key, self.config.encryption_key)
+        if not success:
+            return None
+        try:
+            return str(uuid.UUID(session_guid))
+        except (TypeError, ValueError):
+            return None
 
     async def _authenticate_user(self, request : Request):
         """
@@ -147,7 +333,6 @@ class Area:
         :param request: request to authenticate.
         """
         request.user = None
-        encryption_key = self.config.encryption_key
         membership = self.membership
         set_anonymous_session = False
 
@@ -155,22 +340,41 @@ class Area:
             # does the request contains the session cookie for this area?
             session_cookie_name = self.config.session_cookie_name
             session_key = request.cookies.get(session_cookie_name)
-            if session_key:
-                # try to load the session
-                # decrypt the session key
-                success, session_guid = AesEncryptor.try_decrypt(session_key, encryption_key)
+            kind, value = self.session_tokens.loads(session_key)
+            if kind == anonymous_token_kind:
+                # the session is a transient anonymous session, described by the cookie itself
+                session_guid, expiration = self._read_anonymous_token(value)
+                success, result = membership.restore_transient_session(session_guid, expiration) \
+                    if session_guid else (False, None)
                 if success:
+                    request.user = result.principal
+                    request.session = result.session
+                else:
+                    set_anonymous_session = True
+            elif session_key:
+                # try to load the session
+                legacy_cookie = kind is None
+                if kind == session_token_kind:
+                    session_guid = value
+                elif legacy_cookie:
+                    session_guid = self._read_legacy_cookie(session_key)
+                else:
+                    session_guid = None
+                if session_guid:
                     # try to perform login by session key
                     success, result = await membership.try_login_by_session_key(session_guid)
                     if success:
                         # result is a principal object
                         request.user = result.principal
                         request.session = result.session
+                        if legacy_cookie:
+                            # replace the cookie with one in the current format
+                            self._set_session_cookie(request, self._get_session_token(result.session))
                     else:
                         # the login by session cookie failed: the session could be expired
                         set_anonymous_session = True
                 else:
-                    # session key decryption failed
+                    # the session cookie is not valid
                     set_anonymous_session = True
             else:
                 # the request does not contain a session cookie for this area
@@ -185,9 +389,7 @@ class Area:
         """
         Returns the default culture for this area.
         """
-        if "default_culture" in self.config:
-            return self.config.default_culture
-        return configuration.default_culture
+        return self.cultures.default
 
     def _is_supported_culture(self, culture):
         """
@@ -198,8 +400,7 @@ class Area:
         """
         if not culture:
             return False
-        cultures = self.config.cultures or configuration.cultures
-        return culture in cultures
+        return culture in self.cultures
 
     def _get_culture_for_request(self, request):
         """
@@ -245,10 +446,14 @@ class Area:
         :param f: the request handler to be decorated.
         :return: a wrapped request handler that loads user information.
         """
+        response_cache = getattr(f, "response_cache", None)
+
         @wraps(f)
         async def wrapped(request):
             # set the area property inside the request object
             request.area = self.name
+            # requests handled by the same connection share a task: reads of a new request can use replicas again
+            reset_routing()
             try:
                 await self.before_request(request)
             except InvalidCultureException:
@@ -257,5 +462,21 @@ class Area:
             except InvalidAntiforgeryTokenException:
                 raise HTTPForbidden()
 
-            return await f(request)
+            user = request.user
+            try:
+                if response_cache is not None and request.method in CACHEABLE_METHODS \
+                        and (not user or not user.authenticated):
+                    response = await self._get_cached_response(request, f, response_cache)
+                else:
+                    response = await f(request)
+            except HTTPException:
+                # handlers can respond by raising (e.g. a redirect): their session writes are saved anyway
+                if self.membership:
+                    await self.save_session_data(request)
+                raise
+            if self.membership:
+                await self.save_session_data(request)
+            return response
+        # the area of the handler is used by middlewares, before the request is handled (e.g. admission control)
+        wrapped.area = self.name
         return wrapped
@@ -4,9 +4,13 @@
  This module contains utility functions to set cookies. The request object is extended with two lists:
  cookies_to_set and cookies_to_unset; which are used after the preparation of the response to add or delete cookies.
 """
+import logging
 from core import require_params
 
 
+logger = logging.getLogger(__name__)
+
+
 class CookieToken:
     def __init__(self, name, value, path="/", expires=None, domain=None, max_age=None, secure=None, httponly=None):
         require_params(name=name, value=value)
@@ -22,6 +26,44 @@ class CookieToken:
         self.httponly = httponly
 
 
+def apply_cookies(request, response):
+    """
+    Sets and deletes the cookies of the given request in the response; cookies are applied only once, so this function
+    can be called before a streamed response is prepared, and again by the cookies middleware.
+
+    :param request: request of which cookies must be applied.
+    :param response: response that has not been prepared yet.
+    """
+    for to_set in request.cookies_to_set:
+        response.set_cookie(to_set.name,
+                            to_set.value,
+                            path=to_set.path,
+                            expires=to_set.expires,
+                            domain=to_set.domain,
+                            max_age=to_set.max_age,
+                            secure=to_set.secure,
+                            httponly=to_set.httponly,
+                            version=None)
+
+    for to_unset in request.cookies_to_unset:
+        if isinstance(to_unset, str):
+            response.del_cookie(to_unset)
+        elif isinstance(to_unset, CookieToken):
+            response.del_cookie(to_unset.name)
+        else:
+            raise RuntimeError("Cookies to unset must be of str or CookieToken type.")
+
+    del request.cookies_to_set[:]
+    del request.cookies_to_unset[:]
+
+
+def has_cookies_to_apply(request):
+    """
+    Returns a value indicating whether cookies are going to be set or deleted in the response of the given request.
+    """
+    return bool(getattr(request, "cookies_to_set", None) or getattr(request, "cookies_to_unset", None))
+
+
 async def cookies_middleware(app, handler):
     async def cookies_middleware_handler(request):
         # sets arrays in the request object, that can be manipulated to insert or remove cookies for the response.
@@ -29,23 +71,13 @@ async def cookies_middleware(app, handler):
         request.cookies_to_unset = []
         response = await handler(request)
 
-        for to_set in request.cookies_to_set:
-            response.set_cookie(to_set.name,
-                                to_set.value,
-                                path=to_set.path,
-                                expires=to_set.expires,
-                                domain=to_set.domain,
-                                max_age=to_set.max_age,
-                                secure=to_set.secure,
-                                httponly=to_set.httponly,
-                                version=None)
-
-        for to_unset in request.cookies_to_unset:
-            if isinstance(to_unset, str):
-                response.del_cookie(to_unset)
-            if isinstance(to_unset, CookieToken):
-                response.del_cookie(to_unset.name)
-            raise RuntimeError("Cookies to unset must be of str or CookieToken type.")
+        if response.prepared:
+            # the headers of streamed responses are already sent: cookies must be applied before preparing them
+            if request.cookies_to_set or request.cookies_to_unset:
+                logger.warning("Cookies ignored, since they were set after the response was prepared: %s",
+                               request.path)
+            return response
 
+        apply_cookies(request, response)
         return response
-    return cookies_middleware_handler
\ No newline at end of file
+    return cookies_middleware_handler
@@ -10,25 +10,29 @@
  Therefore in this project template is shown a simpler model, supporting only scoped translations and demonstrating
  the implementation of a custom Jinja2 helper to obtain localized strings.
 """
-from app.translations.regional import regional
+from app import configuration
+from app.translations.catalogs import load_catalogs
+from core.caching import LRUCache
 from core.exceptions import ArgumentNullException
+from core.localization.tables import MISSING_TRANSLATION
+
+
+# translation catalogs by culture, with dotted keys; each catalog is memory-mapped on first use
+translations = load_catalogs()
 
 
 def get_text(language, key, default=None):
     if not language:
         raise ArgumentNullException("language")
 
-    if language not in regional:
+    table = translations.get(language)
+    if table is None:
         return "Missing regional for `{}`".format(language)
 
-    reg = regional[language]
-    parts = key.split(".")
-    v = reg
-    for part in parts:
-        if part not in v:
-            return "Missing translation for `{}`".format(key) if default is None else default
-        v = v[part]
-    return v
+    value = table.get(key)
+    if value is None:
+        return MISSING_TRANSLATION.format(key) if default is None else default
+    return value
 
 
 class InvalidCultureException(Exception):
@@ -37,18 +41,132 @@ class InvalidCultureException(Exception):
     """
 
 
+class CultureSet:
+    """
+    The cultures supported by an area, and its default culture.
+    """
+    __slots__ = ("cultures", "ordered", "by_tag", "default")
+
+    def __init__(self, cultures, default):
+        self.cultures = frozenset(cultures)
+        # cultures in order of configuration, default first
+        self.ordered = tuple([default] + [culture for culture in cultures if culture != default])
+        # language tags are case insensitive
+        self.by_tag = {culture.lower(): culture for culture in cultures}
+        self.default = default
+
+    def __contains__(self, culture):
+        return culture in self.cultures
+
+
+# supported cultures by area, computed once from the configuration
+area_cultures = {}
+# negotiated cultures by area and Accept-Language header value: distinct header values are few
+negotiated_cultures = LRUCache(maxsize=1000)
+
+
+def get_area_cultures(area):
+    """
+    Returns the CultureSet of an area: the cultures supported by the area, and its default culture.
+
+    :param area: the name of the application area.
+    """
+    culture_set = area_cultures.get(area)
+    if culture_set is None:
+        if area not in configuration.areas:
+            raise RuntimeError("The area '{}' is not configured in the application configuration file.".format(area))
+        area_config = configuration.areas[area]
+        default_culture = area_config.get("default_culture") or configuration.get("default_culture")
+        if not default_culture:
+            # default_culture is not configured neither for area nor global configuration.
+            raise RuntimeError("Cannot determine the default culture for area {}."
+                               "Either configure an area default_culture or a global default_culture".format(area))
+        cultures = area_config.get("cultures") or configuration.get("cultures") or [default_culture]
+        culture_set = area_cultures[area] = CultureSet(cultures, default_culture)
+    return culture_set
+
+
 def parse_accept_language(value):
-    languages = value.split(",")
-    locale_q_pairs = []
-    for language in languages:
-        if language.split(";")[0] == language:
-            # no q => q = 1
-            locale_q_pairs.append((language.strip(), "1"))
-    else:
-        locale = language.split(";")[0].strip()
-        q = language.split(";")[1].split("=")[1]
-        locale_q_pairs.append((locale, q))
-    return locale_q_pairs
+    """
+    Parses the value of an Accept-Language header (RFC 7231, section 5.3.5).
+
+    :param value: header value, e.g. "it-CH, it;q=0.9, en;q=0.8, *;q=0.5".
+    :return: list of (language range, quality) pairs, sorted by descending quality; ranges with the same quality keep
+             the order of the header.
+    """
+    pairs = []
+    for item in value.split(","):
+        language, _, parameters = item.partition(";")
+        language = language.strip()
+        if not language:
+            continue
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, parameter_value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(parameter_value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        pairs.append((language, quality))
+    pairs.sort(key=lambda pair: -pair[1])
+    return pairs
+
+
+def get_excluded_cultures(language, culture_set):
+    """
+    Returns the cultures excluded by a language range with quality 0: the culture with the same tag, and the more
+    specific ones (e.g. "en" excludes "en" and "en-GB").
+    """
+    tag = language.lower()
+    prefix = tag + "-"
+    return {culture for key, culture in culture_set.by_tag.items() if key == tag or key.startswith(prefix)}
+
+
+def negotiate_culture(accept_language, culture_set):
+    """
+    Returns the supported culture that best matches the value of an Accept-Language header, in order of quality.
+    A language range matches a culture with the same tag; otherwise, its subtags are removed from the end to find a
+    more generic culture (RFC 4647 lookup, e.g. "it-CH" -> "it"); otherwise, it matches a more specific culture
+    (e.g. "en" -> "en-GB"). Cultures excluded by ranges with quality 0 are never returned, if possible; the wildcard
+    "*" matches the default culture, or the first supported culture that is not excluded.
+
+    :param accept_language: value of an Accept-Language header.
+    :param culture_set: CultureSet of the area.
+    """
+    by_tag = culture_set.by_tag
+    pairs = parse_accept_language(accept_language)
+    excluded = set()
+    for language, quality in pairs:
+        if quality <= 0 and language != "*":
+            excluded.update(get_excluded_cultures(language, culture_set))
+
+    for language, quality in pairs:
+        if quality <= 0:
+            # not acceptable; the following ranges have the same quality
+            break
+        if language == "*":
+            return get_fallback_culture(culture_set, excluded)
+        tag = language.lower()
+        while tag:
+            if tag in by_tag and by_tag[tag] not in excluded:
+                return by_tag[tag]
+            tag = tag.rpartition("-")[0]
+        prefix = language.lower() + "-"
+        for tag in sorted(by_tag):
+            if tag.startswith(prefix) and by_tag[tag] not in excluded:
+                return by_tag[tag]
+    return get_fallback_culture(culture_set, excluded)
+
+
+def get_fallback_culture(culture_set, excluded):
+    """
+    Returns the default culture, or the first supported culture that is not excluded.
+    """
+    for culture in culture_set.ordered:
+        if culture not in excluded:
+            return culture
+    return culture_set.default
 
 
 def get_best_culture(request, area):
@@ -61,31 +179,15 @@ def get_best_culture(request, area):
     :param area: the name of the application area.
     :return: default culture.
     """
-    app = request.app
-    config = app.config
-    area = config.areas[area]
-    if not area:
-        raise RuntimeError("The area '{}' is not configured in the application configuration file.".format(area))
-
-    supported_cultures = area.cultures
-    try:
-        default_culture = area.get("default_culture", config.default_culture)
-    except KeyError:
-        # default_culture is not configured neither for area nor global configuration.
-        raise RuntimeError("Cannot determine the default culture for area {}."
-                           "Either configure an area default_culture or a global default_culture".format(area))
+    culture_set = get_area_cultures(area)
     accept_language = request.headers.get("Accept-Language")
     if not accept_language:
         # the request does not include an Accept-Language header; so we can only return our default culture.
-        return default_culture
-
-    client_languages = parse_accept_language(accept_language)
-    for language, _ in client_languages:
-        if language in supported_cultures:
-            return language
-        # no language was found, try again but considering only the first part of strings (language without full locale)
-        if "-" in language:
-            part_without_locale = language.split("-")[0]
-            if part_without_locale in supported_cultures:
-                return part_without_locale
-    return default_culture
+        return culture_set.default
+
+    key = (area, accept_language)
+    culture = negotiated_cultures.get(key)
+    if culture is None:
+        culture = negotiate_culture(accept_language, culture_set)
+        negotiated_cultures.set(key, culture)
+    return culture
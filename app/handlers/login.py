@@ -0,0 +1,39 @@
+"""
+ This module contains the logic shared by the login handlers of the application areas.
+"""
+from aiohttp.web import json_response
+from app.responses import bad_request, JSON_TYPE
+
+
+TRUE_VALUES = {True, "true", "on", "1"}
+
+
+async def login(area, request):
+    """
+    Handles a login request for the given area; the request can contain a JSON body or form data, with userkey,
+    password and remember values. Password verification runs in the membership provider hashing executor.
+
+    :param area: the area of the login request.
+    :param request: login request.
+    """
+    if request.content_type == JSON_TYPE:
+        data = await request.json()
+    else:
+        data = await request.post()
+
+    userkey = data.get("userkey")
+    password = data.get("password")
+    if not userkey or not password:
+        return bad_request()
+
+    success, result = await area.membership.try_login(userkey,
+                                                      password,
+                                                      data.get("remember") in TRUE_VALUES,
+                                                      area.get_client_ip(request),
+                                                      request.headers.get("User-Agent"))
+    if not success:
+        # result is the error code
+        return json_response({"success": False, "error": result}, status=401)
+
+    await area.sign_in(request, result)
+    return json_response({"success": True})
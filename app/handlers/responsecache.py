@@ -0,0 +1,140 @@
+"""
+ This module contains the cache of full page responses, for pages that are the same for all anonymous users of a
+ culture.
+
+ Cached bodies are rendered with a placeholder instead of the antiforgery token, which is session specific: the token
+ of the current session is put in place of the placeholder at each hit. Responses have an ETag, so clients revalidating
+ a page receive 304 Not Modified, without body.
+"""
+import hashlib
+from aiohttp import web
+from app import configuration
+from core.caching import LRUCache
+from .cookies import has_cookies_to_apply
+
+
+response_cache_defaults = {
+    "ttl": 60,  # seconds
+    "maxsize": 100  # cached responses, by handler
+}
+# methods of requests that can be served from cache
+CACHEABLE_METHODS = {"GET", "HEAD"}
+ANTIFORGERY_PLACEHOLDER = "__antiforgery_token__"
+
+
+class CachedResponse:
+    """
+    Body and headers of a rendered page, with the antiforgery placeholder.
+    """
+    __slots__ = ("body", "content_type", "charset", "etag", "has_placeholder")
+
+    def __init__(self, body, content_type, charset):
+        self.body = body
+        self.content_type = content_type
+        self.charset = charset
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.has_placeholder = ANTIFORGERY_PLACEHOLDER.encode("ascii") in body
+
+
+class AntiforgeryPlaceholder:
+    """
+    Function returning the antiforgery placeholder, put in the request context instead of the function returning the
+    antiforgery token, while a page that can be cached is rendered. Responses that are sent while rendering, like
+    streamed templates, must use the original function (see get_antiforgery).
+    """
+    __slots__ = ("antiforgery", "used")
+
+    def __init__(self, antiforgery):
+        self.antiforgery = antiforgery
+        self.used = False
+
+    def __call__(self):
+        self.used = True
+        return ANTIFORGERY_PLACEHOLDER
+
+
+def get_antiforgery(value):
+    """
+    Returns the function returning the antiforgery token of a request context, in place of the placeholder function.
+
+    :param value: antiforgery function of the request context.
+    """
+    if isinstance(value, AntiforgeryPlaceholder):
+        return value.antiforgery
+    return value
+
+
+class ResponseCache:
+    """
+    Cache of the responses of a request handler, by path, culture and cache seed.
+    """
+    def __init__(self, ttl=None, maxsize=None):
+        self.ttl = ttl if ttl is not None else response_cache_defaults["ttl"]
+        self.items = LRUCache(maxsize=maxsize or response_cache_defaults["maxsize"], ttl=self.ttl)
+
+    @staticmethod
+    def get_key(request):
+        return request.path_qs, request.culture, configuration.cache_seed
+
+    def get(self, request):
+        return self.items.get(self.get_key(request))
+
+    def store(self, request, response):
+        """
+        Stores the given response, if it can be cached; returns the cached response, or None.
+
+        :param request: request that generated the response.
+        :param response: response returned by the request handler.
+        """
+        if type(response) is not web.Response or response.status != 200 or response.body is None:
+            return None
+        if response.cookies or "Set-Cookie" in response.headers or has_cookies_to_apply(request):
+            # the response is specific for the user: cookies are copied to headers only when it is prepared, and
+            # cookies pending in the request are applied by the cookies middleware
+            return None
+        cached = CachedResponse(response.body, response.content_type, response.charset)
+        self.items.set(self.get_key(request), cached)
+        return cached
+
+    def stats(self):
+        return self.items.stats()
+
+
+def get_response(request, cached, antiforgery=None):
+    """
+    Returns the response for a request served from cache; 304 Not Modified if the client has the same version.
+
+    :param request: request to respond to.
+    :param cached: cached response.
+    :param antiforgery: function returning the antiforgery token of the request.
+    """
+    body = cached.body
+    etag = cached.etag
+    if cached.has_placeholder and antiforgery is not None:
+        token = antiforgery()
+        body = body.replace(ANTIFORGERY_PLACEHOLDER.encode("ascii"), token.encode("utf-8"))
+        # the body depends on the session
+        etag = hashlib.sha1((etag + token).encode("utf-8")).hexdigest()
+    etag = "\"{}\"".format(etag)
+
+    if request.headers.get("If-None-Match") == etag:
+        response = web.Response(status=304)
+    else:
+        response = web.Response(body=body)
+        response.content_type = cached.content_type
+        response.charset = cached.charset
+    response.headers["ETag"] = etag
+    # clients must revalidate pages, since they can change when the user signs in
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def replace_placeholder(response, antiforgery=None):
+    """
+    Puts the antiforgery token in place of the placeholder, in a response that could not be cached.
+    """
+    if isinstance(response, web.Response) and response.body and antiforgery is not None:
+        placeholder = ANTIFORGERY_PLACEHOLDER.encode("ascii")
+        if placeholder in response.body:
+            response.body = response.body.replace(placeholder, antiforgery().encode("utf-8"))
+    return response
@@ -2,14 +2,15 @@
 * Copyright 2016, Roberto Prevato roberto.prevato@gmail.com
 * https://github.com/RobertoPrevato/aiohttp-three-template
 *
-* AntiForgeryToken implementation using the double token strategy, session based
+* AntiForgeryToken implementation using the double submit strategy, session based
 * (generated tokens are session specific).
 *
 * Licensed under the MIT license:
 * http://www.opensource.org/licenses/MIT
 """
-import uuid
-from core.encryption.aes import AesEncryptor
+import hmac
+import os
+from core.encryption.signing import urlsafe_encode
 from app.handlers.cookies import CookieToken
 from app import configuration
 
@@ -18,6 +19,10 @@ __all__ = ["InvalidAntiforgeryTokenException", "validate_aft", "issue_aft"]
 header_name = "X-AFT"
 form_name = "aft"
 cookie_name = "aftck"
+# content types of requests that can carry the token in form values
+FORM_CONTENT_TYPES = {"application/x-www-form-urlencoded", "multipart/form-data"}
+NONCE_LENGTH = 16
+MAX_NONCE_LENGTH = 64
 
 
 class InvalidAntiforgeryTokenException(Exception):
@@ -29,11 +34,21 @@ class InvalidAntiforgeryTokenException(Exception):
 AFT_IGNORE_METHODS = {"GET", "OPTIONS", "HEAD"}
 
 
-def validate_aft(request):
+def get_token(signer, session, nonce):
+    """
+    Returns the antiforgery token for a session and the random nonce stored in the antiforgery cookie.
+    """
+    return signer.get_signature("{}.{}".format(session.guid, nonce))
+
+
+async def validate_aft(request, signer):
     """
     Validates the AFT of a given request.
-    Utilizes dual token strategy (session based encrypted token, issued in both cookie and page);
-    sent at each request in both cookie and request header, for ajax requests or form values.
+    Utilizes double submit strategy: a random nonce is stored in a cookie, and the token sent at each request in the
+    request header (for ajax requests) or form values is the HMAC of the session guid and of the nonce.
+
+    :param request: request to validate.
+    :param signer: signer of the area, used to compute tokens.
     """
     # ignore get, options, head
     if request.method in AFT_IGNORE_METHODS:
@@ -42,69 +57,52 @@ def validate_aft(request):
     # requires the request to have a session
     if not request.session:
         raise RuntimeError("Missing session inside the request object; cannot issue an AFT without session.")
-    # expect the request session to have a guid
-    encryption_key = request.session.guid
 
     # get the tokens: one is always in the cookie; the second may be inside form or request header
     # request header is more important, assuming that pages implement AJAX requests, rather than form submission
-    cookie_token = request.cookies.get(cookie_name)
-    second_token = request.headers[header_name] if header_name in request.headers else None
+    nonce = request.cookies.get(cookie_name)
+    token = request.headers.get(header_name)
 
-    if second_token is None:
-        # try to read from form
-        second_token = request.form[form_name] if form_name in request.form else None
+    if token is None and request.content_type in FORM_CONTENT_TYPES:
+        # try to read from form (the parsed form is cached by the request)
+        form = await request.post()
+        token = form.get(form_name)
 
     # are the tokens present?
-    if not cookie_token or not second_token:
+    if not nonce or not token or len(nonce) > MAX_NONCE_LENGTH:
         raise InvalidAntiforgeryTokenException()
 
-    # decrypt the tokens; decryption will fail if the tokens were issued for another session;
-    a, cookie_token = AesEncryptor.try_decrypt(cookie_token, encryption_key)
-    b, second_token = AesEncryptor.try_decrypt(second_token, encryption_key)
-
-    if not a or not b or not cookie_token or not second_token:
-        raise InvalidAntiforgeryTokenException()
-
-    # are the tokens identical?
-    if cookie_token != second_token:
+    # the token must have been issued for this session and this cookie
+    if not hmac.compare_digest(token.encode("utf-8"), get_token(signer, request.session, nonce).encode("ascii")):
         raise InvalidAntiforgeryTokenException()
 
 
-def issue_aft(request):
+def issue_aft(request, signer):
     """
-    Issues a new session based antiforgery token.
+    Returns the session based antiforgery token of a request, to be rendered inside the html view.
 
-    This solution implements the double token strategy: the same antiforgery token is serialized twice,
-    hence producing two different encrypted strings. One is set as response cookie; one is returned to be rendered
-    inside the html view.
+    The token is computed once per request; the antiforgery cookie is set only if the request does not contain it
+    already, so the same token can be rendered in many forms of the same page, or of different pages.
+
+    :param request: request for which the token is issued.
+    :param signer: signer of the area, used to compute tokens.
     """
+    token = getattr(request, "aft", None)
+    if token is not None:
+        return token
     # check if the session is defined inside the request
-    if not hasattr(request, "session"):
+    if not hasattr(request, "session") or signer is None:
         # missing session context; use the AntiforgeryValidate after the membership provider
         raise ValueError("missing session context")
-    encryption_key = str(request.session.guid)
-
-    cookie_token = request.cookies.get(cookie_name)
-    if not cookie_token:
-        #define a new token
-        cookie_token = uuid.uuid1()
-    else:
-        can_decrypt, value = AesEncryptor.try_decrypt(cookie_token, encryption_key)
-        if not can_decrypt:
-            cookie_token = uuid.uuid1()
-        else:
-            # use the same value of before
-            cookie_token = value
-
-    # will set a new cookie in the response object
-    cookie_token = str(cookie_token)
-    encrypted_token = AesEncryptor.encrypt(cookie_token, encryption_key)
-    # the cookie will be set in response object inside global_handlers function
-    request.cookies_to_set.append(CookieToken(cookie_name,
-                                              encrypted_token.decode("utf-8"),
-                                              httponly=True,
-                                              secure=configuration.secure_cookies))
-
-    # return the token encrypted with AES; many calls always return a different value
-    v = AesEncryptor.encrypt(cookie_token, encryption_key)
-    return v.decode("utf-8")
+
+    nonce = request.cookies.get(cookie_name)
+    if not nonce or len(nonce) > MAX_NONCE_LENGTH:
+        # define a new nonce; the cookie will be set in response object by the cookies middleware
+        nonce = urlsafe_encode(os.urandom(NONCE_LENGTH))
+        request.cookies_to_set.append(CookieToken(cookie_name,
+                                                  nonce,
+                                                  httponly=True,
+                                                  secure=configuration.secure_cookies))
+
+    token = request.aft = get_token(signer, request.session, nonce)
+    return token
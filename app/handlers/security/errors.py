@@ -10,7 +10,8 @@
 """
 from aiohttp.web import HTTPClientError, HTTPException
 from app import configuration
-from app.responses import error
+from app.responses import error, service_unavailable
+from dal.exceptions import PoolTimeout
 
 
 async def errors_middleware(app, handler):
@@ -25,6 +26,9 @@ async def errors_middleware(app, handler):
             return e
         except HTTPClientError as e:
             return e
+        except PoolTimeout as ex:
+            # the database is saturated: the client should retry later
+            return service_unavailable(ex.retry_after)
         except Exception as ex:
             if show_error_details:
                 # return error details to the client
@@ -0,0 +1,56 @@
+"""
+ This module contains a Jinja2 extension to cache fragments of templates, rendered once and reused across requests:
+
+    {% cache "footer", 3600 %} ... {% endcache %}
+
+ The first argument is the name of the fragment; the second is the time-to-live in seconds (optional, the cache
+ default if missing). Other arguments are added to the cache key, for fragments that vary, for example by user:
+
+    {% cache "menu", 60, user.id %} ... {% endcache %}
+
+ Keys always include the template name and the culture of the request context, since the same template is rendered
+ differently in each culture.
+"""
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Jinja2 extension adding the cache tag; fragments are stored in the fragment_cache of the environment, that can be
+    any object with the get and set methods of LRUCache. When the fragment_cache is None, fragments are always
+    rendered.
+    """
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.ContextReference(), parser.parse_expression()]
+
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+
+        parts = []
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        args.append(nodes.Tuple(parts, "load"))
+
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        return nodes.CallBlock(self.call_method("_cache_support", args), [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, context, name, ttl, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = (context.name, name, context.get("culture")) + parts
+        value = cache.get(key)
+        if value is None:
+            value = caller()
+            cache.set(key, value, ttl)
+        return value
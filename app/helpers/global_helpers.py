@@ -1,6 +1,8 @@
 from datetime import datetime
 from aiohttp_jinja2 import get_env
-from .resources import resources
+from core.caching import LRUCache
+from .fragments import FragmentCacheExtension
+from .resources import resources, styles
 from app import configuration
 
 
@@ -18,9 +20,12 @@ def setup_global_helpers(app):
 
     def res(*args):
         return resources(args,
-                         development=conf.development,
                          cache_seed=conf.cache_seed)
 
+    def css(*args):
+        return styles(args,
+                      cache_seed=conf.cache_seed)
+
     try:
         ga_token = configuration.google_analytics
     except KeyError:
@@ -32,7 +37,15 @@ def setup_global_helpers(app):
     helpers = {
         "copy": get_copy,
         "google_analytics": google_analytics,
-        "resources": res
+        "resources": res,
+        "styles": css
     }
 
     env.globals.update(helpers)
+
+    # cache tag for template fragments; in development, fragments are always rendered, like templates are reloaded
+    env.add_extension(FragmentCacheExtension)
+    templates_conf = conf.templates if "templates" in conf else {}
+    if not conf.development:
+        env.fragment_cache = LRUCache(maxsize=templates_conf.get("fragment_cache_size", 1000),
+                                      ttl=templates_conf.get("fragment_ttl", 300))
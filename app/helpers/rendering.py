@@ -0,0 +1,258 @@
+"""
+ This module contains the rendering of Jinja2 templates with translations resolved at compile time.
+
+ For each culture, an overlay of the application Jinja2 environment is created, with the TranslationsExtension: calls
+ to the localization helper with a constant key, like {{_("site.name")}}, are replaced with the translated string while
+ templates are compiled, so they become literals in the compiled template of each culture. Calls with variable keys
+ are still resolved at runtime, by the _ function in the request context.
+
+ In production, compiled templates are stored in a bytecode cache on disk, shared by all worker processes: the cache
+ keys of culture environments include the culture and the version of its translations, since the same template source
+ is compiled differently for each culture. Templates can be compiled ahead of time, with compiletemplates.py.
+
+ Large pages can be streamed with stream_template, which sends the chunks generated by Jinja2 while rendering: the
+ beginning of the page is sent as soon as possible, so the browser can fetch the resources referenced in <head> while
+ the rest of the page is rendered.
+"""
+import asyncio
+import logging
+import os
+import aiohttp_jinja2
+from aiohttp import web
+from aiohttp_jinja2 import APP_KEY, REQUEST_CONTEXT_KEY, get_env
+from jinja2 import FileSystemBytecodeCache
+from jinja2.ext import Extension
+from jinja2.lexer import Token
+from app import configuration
+from app.handlers.cookies import apply_cookies
+from app.handlers.localization import translations
+from app.handlers.responsecache import get_antiforgery
+
+
+logger = logging.getLogger(__name__)
+
+app_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+template_defaults = {
+    "cache_size": 400,  # number of compiled templates kept in memory, by environment
+    "bytecode_cache": None,  # folder of the bytecode cache, relative to the application folder
+    "stream_first_chunk": 2048,  # characters rendered before sending the beginning of a streamed page
+    "stream_chunk": 16384  # characters buffered before sending the next part of a streamed page
+}
+
+
+translation_function_name = "_"
+
+
+class TranslationsExtension(Extension):
+    """
+    Jinja2 extension replacing calls to the localization helper having a constant key with the translated string,
+    from the translations table of the environment.
+    """
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(translations_table=None)
+
+    def filter_stream(self, stream):
+        table = self.environment.translations_table
+        tokens = list(stream)
+        if table is None:
+            return tokens
+        filtered = []
+        i, count = 0, len(tokens)
+        while i < count:
+            token = tokens[i]
+            if token.type == "name" and token.value == translation_function_name and i + 3 < count \
+                    and tokens[i + 1].type == "lparen" \
+                    and tokens[i + 2].type == "string" \
+                    and tokens[i + 3].type == "rparen" \
+                    and (i == 0 or tokens[i - 1].type != "dot"):
+                value = table.get(tokens[i + 2].value)
+                if value is not None:
+                    filtered.append(Token(token.lineno, "string", value))
+                    i += 4
+                    continue
+            filtered.append(token)
+            i += 1
+        return filtered
+
+
+class CultureBytecodeCache(FileSystemBytecodeCache):
+    """
+    Bytecode cache of the templates compiled for a culture, with the translations of a certain version.
+    """
+    def __init__(self, directory, culture, version):
+        super().__init__(directory)
+        self.prefix = "{}:{}:".format(culture, version)
+
+    def get_cache_key(self, name, filename=None):
+        return super().get_cache_key(self.prefix + name, filename)
+
+
+def get_template_options():
+    """
+    Returns the options of the Jinja2 environment: in development, templates are reloaded when changed; otherwise,
+    they are never checked for changes and compiled templates are stored in the bytecode cache, if configured.
+    """
+    conf = configuration.templates if "templates" in configuration else {}
+    options = {key: conf[key] if key in conf else value for key, value in template_defaults.items()}
+    development = configuration.development
+    bytecode_cache = None
+    if options["bytecode_cache"] and not development:
+        directory = os.path.join(app_path, options["bytecode_cache"])
+        os.makedirs(directory, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(directory)
+    return {
+        "auto_reload": development,
+        "cache_size": options["cache_size"],
+        "bytecode_cache": bytecode_cache
+    }
+
+
+def get_culture_app_key(culture):
+    """
+    Returns the key of the Jinja2 environment of a culture, in the application.
+    """
+    return "{}_{}".format(APP_KEY, culture)
+
+
+def setup_translations(app):
+    """
+    Creates the Jinja2 environments of the cultures supported by the application, sharing the globals of the
+    application environment.
+    """
+    env = get_env(app)
+    for culture, table in translations.items():
+        bytecode_cache = env.bytecode_cache
+        if bytecode_cache is not None:
+            bytecode_cache = CultureBytecodeCache(bytecode_cache.directory, culture, get_translations_version(table))
+        culture_env = env.overlay(extensions=[TranslationsExtension], bytecode_cache=bytecode_cache)
+        culture_env.translations_table = table
+        app[get_culture_app_key(culture)] = culture_env
+
+
+def get_translations_version(table):
+    """
+    Returns the version of a translations catalog, which changes when the catalog is compiled again.
+    """
+    return int(os.path.getmtime(table.path))
+
+
+def get_environments(app):
+    """
+    Returns the Jinja2 environments of the application: the default one, and the ones of cultures.
+    """
+    keys = [APP_KEY] + [get_culture_app_key(culture) for culture in translations]
+    return [app[key] for key in keys if key in app]
+
+
+def load_templates(app):
+    """
+    Compiles all the templates of the application, in all environments; so the first requests served by a worker
+    process do not pay for compilation. Compiled templates are written to the bytecode cache, if configured.
+
+    :return: number of loaded templates.
+    """
+    count = 0
+    for env in get_environments(app):
+        for name in env.list_templates():
+            env.get_template(name)
+            count += 1
+    logger.info("Loaded %d templates", count)
+    return count
+
+
+def get_request_app_key(request):
+    """
+    Returns the key of the Jinja2 environment of the request culture.
+    """
+    culture = getattr(request, "culture", None)
+    app_key = get_culture_app_key(culture) if culture else APP_KEY
+    if app_key not in request.app:
+        app_key = APP_KEY
+    return app_key
+
+
+def render_template(template_name, request, context):
+    """
+    Renders a template, with the Jinja2 environment of the request culture.
+    """
+    return aiohttp_jinja2.render_template(template_name, request, context, app_key=get_request_app_key(request))
+
+
+def get_stream_options():
+    conf = configuration.templates if "templates" in configuration else {}
+    return {key: conf[key] if key in conf else template_defaults[key] for key in ("stream_first_chunk",
+                                                                                   "stream_chunk")}
+
+
+async def stream_template(template_name, request, context, encoding="utf-8"):
+    """
+    Renders a template with the Jinja2 environment of the request culture, writing the generated chunks to a chunked
+    response while rendering. The response is prepared after the first chunk is rendered, so errors at the beginning
+    of the template are handled like for other responses; errors happening later are logged, and the connection is
+    closed.
+
+    Cookies are sent with the headers, at the beginning of the response: cookies set while rendering (e.g. the
+    antiforgery cookie) are sent only if they are set before the first chunk. Session data modified by the request
+    handler is saved before sending the headers, so a transient session can be persisted with its cookie. Streamed
+    pages are never stored in the response cache, so they are rendered with the antiforgery token of the request.
+
+    :param template_name: name of the template.
+    :param request: request to respond to.
+    :param context: template context.
+    :param encoding: encoding of the response.
+    :return: prepared StreamResponse.
+    """
+    options = get_stream_options()
+    env = request.app[get_request_app_key(request)]
+    template = env.get_template(template_name)
+    if context is None:
+        context = {}
+    for key, value in request.get(REQUEST_CONTEXT_KEY, {}).items():
+        if key not in context:
+            context[key] = value
+    if "antiforgery" in context:
+        # the page is sent while rendering, so it cannot be cached with the antiforgery placeholder
+        context["antiforgery"] = get_antiforgery(context["antiforgery"])
+
+    chunks = template.generate(context)
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= options["stream_first_chunk"]:
+            break
+
+    save_session_data = getattr(request, "save_session_data", None)
+    if save_session_data is not None:
+        # a transient session persisted now can still set its cookie
+        await save_session_data()
+
+    response = web.StreamResponse()
+    response.content_type = "text/html"
+    response.charset = encoding
+    response.enable_chunked_encoding()
+    apply_cookies(request, response)
+    request.response_prepared = True
+    await response.prepare(request)
+
+    try:
+        response.write("".join(buffer).encode(encoding))
+        await response.drain()
+        buffer, size = [], 0
+        for chunk in chunks:
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= options["stream_chunk"]:
+                response.write("".join(buffer).encode(encoding))
+                await response.drain()
+                buffer, size = [], 0
+        if buffer:
+            response.write("".join(buffer).encode(encoding))
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        # the status and headers are already sent: the client gets a truncated page
+        logger.exception("Error while streaming template `%s`", template_name)
+        response.force_close()
+    return response
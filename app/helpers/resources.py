@@ -1,22 +1,64 @@
 """
  Copyright 2016, Roberto Prevato roberto.prevato@gmail.com
 
- This module contains functions to read configuration file for JavaScript resources, to generate <script> tags using
- dynamically.
- The configuration file is read both by Grunt/Gulp to generate built and minified javascript,
+ This module contains functions to read configuration files for JavaScript and CSS resources, to generate <script> and
+ <link> tags dynamically.
+ The scripts configuration file is read both by Grunt/Gulp to generate built and minified javascript,
  and by the Python application, to generate <script> tags.
+
+ Generated tags are memoized by set names and cache seed. Configuration files are read once: in development, the
+ ResourcesWatcher checks periodically whether they changed, and clears the memoized tags.
 """
 import re
 import json
+import logging
 from os import path, pardir
+from core.caching import LRUCache
 from core.literature.scribe import Scribe
 from core.literature.text import Text
 
-CONFIGURATION = None
+
+logger = logging.getLogger(__name__)
+
+SCRIPTS = "scripts"
+STYLES = "styles"
+# configurations of resources, by kind
+CONFIGURATIONS = {}
+# generated tags, by kind, set names and cache seed
+tags_cache = LRUCache(maxsize=200)
+
+
+def get_resources_config(kind):
+    """
+    Returns the configuration of the given kind of resources, loading it on first use.
+    """
+    conf = CONFIGURATIONS.get(kind)
+    if conf is None:
+        conf = CONFIGURATIONS[kind] = load_resources_config(kind)
+    return conf
+
+
+def get_tags(kind, names, conf, cache_seed, get_set_tags):
+    if cache_seed is None:
+        cache_seed = "0"
+
+    if isinstance(names, str):
+        names = [names]
+    names = tuple(names)
+
+    if conf is not None:
+        return get_set_tags(names, conf, cache_seed)
+
+    key = (kind, names, cache_seed)
+    tags = tags_cache.get(key)
+    if tags is None:
+        tags = get_set_tags(names, get_resources_config(kind), cache_seed)
+        tags_cache.set(key, tags)
+    return tags
+
 
 def resources(names,
               conf=None,
-              development=False,
               cache_seed=None):
     """
         Defines an helper function to generate links to scripts elements, by set names.
@@ -24,20 +66,13 @@ def resources(names,
         2. if bundling is enabled, a single script element per set is generated, for bundled files.
         3. if also minification is enabled, a single script element per set is generated, for minified files.
         4. the same configuration file is read by Grunt.js to generate bundled and minified scripts upon publishing.
+        Generated elements are memoized; in development, they are refreshed when the configuration file changes
+        (see ResourcesWatcher).
     """
-    global CONFIGURATION
-
-    if cache_seed is None:
-        cache_seed = "0"
-
-    if isinstance(names, str):
-        names = [names]
+    return get_tags(SCRIPTS, names, conf, cache_seed, get_script_tags)
 
-    if conf is None:
-        if CONFIGURATION is None or development:
-            CONFIGURATION = load_resources_config()
-        conf = CONFIGURATION
 
+def get_script_tags(names, conf, cache_seed):
     bundling = conf["bundling"]
     minification = conf["minification"]
     sets = conf["sets"]
@@ -58,6 +93,63 @@ def resources(names,
     return "\n".join(a)
 
 
+def styles(names,
+           conf=None,
+           cache_seed=None):
+    """
+        Defines an helper function to generate links to stylesheets, by set names, from the file
+        /configuration/styles.js. Generated elements are memoized, like the ones of the resources helper.
+    """
+    return get_tags(STYLES, names, conf, cache_seed, get_style_tags)
+
+
+def get_style_tags(names, conf, cache_seed):
+    sets = conf["sets"]
+
+    a = []
+    for name in names:
+        if not name in sets:
+            raise ValueError("The set `{}` is not configured inside /configuration/styles.js".format(name))
+        for f in sets[name]:
+            a.append("<link rel=\"stylesheet\" href=\"/{}?s={}\" />".format(f, cache_seed))
+
+    return "\n".join(a)
+
+
+class ResourcesWatcher:
+    """
+    Polls the modification times of resources configuration files; when a file changes, its configuration is reloaded
+    on next use and memoized tags are cleared.
+    """
+    def __init__(self, kinds=(SCRIPTS, STYLES)):
+        self.mtimes = {kind: self.get_mtime(kind) for kind in kinds}
+
+    @staticmethod
+    def get_mtime(kind):
+        try:
+            return path.getmtime(get_config_path(kind))
+        except OSError:
+            return None
+
+    def check(self):
+        """
+        Checks whether configuration files changed, clearing memoized tags if necessary.
+
+        :return: kinds of resources whose configuration changed.
+        """
+        changed = []
+        for kind, mtime in self.mtimes.items():
+            current = self.get_mtime(kind)
+            if current != mtime:
+                self.mtimes[kind] = current
+                CONFIGURATIONS.pop(kind, None)
+                changed.append(kind)
+        if changed:
+            tags_cache.clear()
+            logger.info("Resources configuration changed: %s", ", ".join(changed))
+        return changed
+
+
 comment_re = re.compile(
     r'(^)?[^\S\n]*/(?:\*(.*?)\*/[^\S\n]*|/[^\n]*)($)?',
     re.DOTALL | re.MULTILINE
@@ -84,14 +176,17 @@ def remove_comments(text):
     return comment_re.sub(comment_replacer, text)
 
 
-def load_resources_config():
+def get_config_path(kind):
+    base_path = path.abspath(path.join(path.dirname(__file__), pardir))
+    return path.join(base_path, "configuration", kind + ".js")
+
+
+def load_resources_config(kind=SCRIPTS):
     """
-    Loads the resources configuration.
+    Loads the resources configuration of the given kind.
     """
     try:
-        base_path = path.abspath(path.join(path.dirname(__file__), pardir))
-        scripts_config = path.join(base_path, "configuration", "scripts.js")
-        contents = Scribe.read(scripts_config)
+        contents = Scribe.read(get_config_path(kind))
         # extract the information that we care about
         contents = remove_comments(contents).replace("module.exports = {", "{")
         contents = Text.remove_line_breaks(contents)
@@ -99,6 +194,6 @@ def load_resources_config():
         data = json.loads(contents)
         return data
     except Exception as ex:
-        print("ERROR: while loading the scripts configuration for the resources helper.")
+        print("ERROR: while loading the {} configuration for the resources helper.".format(kind))
         print(str(ex))
         raise
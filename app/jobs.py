@@ -0,0 +1,93 @@
+"""
+ This module contains the periodic jobs of the application, executed by the scheduler started in app.server.init.
+ Sliding expiration times of sessions are written periodically by each worker process; so is the limit of database
+ connections adapted, when the pool is adaptive. In development, changes to resources configuration files are watched.
+
+ Maintenance jobs are exclusive: when the application runs in many worker processes, a PostgreSQL advisory lock
+ ensures that a single worker runs them at a time.
+"""
+import logging
+from core.scheduling import Scheduler
+from dal import get_client
+from dal.locks import run_exclusively
+from app.helpers.resources import ResourcesWatcher
+
+
+logger = logging.getLogger(__name__)
+
+job_defaults = {
+    "jitter": 0.1,
+    "purge_sessions_interval": 60 * 10,  # seconds
+    "purge_login_attempts_interval": 60 * 60,  # seconds
+    "watch_resources_interval": 1  # seconds, in development
+}
+
+
+async def flush_session_touches(providers):
+    """
+    Writes the sliding expiration times recorded in memory by the given membership providers.
+    """
+    for provider in providers:
+        await provider.flush_session_touches()
+
+
+def get_purge_job(name, purge):
+    async def job():
+        deleted = await purge()
+        if deleted:
+            logger.info("%s: deleted %d rows", name, deleted)
+    return job
+
+
+def setup_jobs(app, providers):
+    """
+    Creates the application scheduler, with maintenance jobs for the given membership providers by area name.
+
+    :param app: application.
+    :param providers: dictionary of membership providers by area name.
+    :return: scheduler
+    """
+    config = app.config
+    jobs_config = config.jobs if "jobs" in config else {}
+    options = {key: jobs_config[key] if key in jobs_config else value for key, value in job_defaults.items()}
+
+    scheduler = Scheduler(app.loop, exclusive_runner=run_exclusively)
+    jitter = options["jitter"]
+
+    for area_name, provider in providers.items():
+        name = "{}-purge-sessions".format(area_name)
+        scheduler.add_job(name,
+                          get_purge_job(name, provider.purge_expired_sessions),
+                          options["purge_sessions_interval"],
+                          jitter=jitter,
+                          exclusive=True)
+
+        name = "{}-purge-login-attempts".format(area_name)
+        scheduler.add_job(name,
+                          get_purge_job(name, provider.purge_login_attempts),
+                          options["purge_login_attempts_interval"],
+                          jitter=jitter,
+                          exclusive=True)
+
+        if provider.options.sliding_expiration:
+            # each process writes the activity of its own sessions
+            scheduler.add_job("{}-touch-sessions".format(area_name),
+                              provider.flush_session_touches,
+                              provider.options.session_touch_interval,
+                              jitter=jitter)
+
+    dbclient = get_client()
+    if dbclient is not None and dbclient.adaptive:
+        scheduler.add_job("adjust-pool", dbclient.adjust, dbclient.adaptive_interval, jitter=jitter)
+
+    if config.development:
+        # generated resources tags are memoized: refresh them when their configuration files change
+        watcher = ResourcesWatcher()
+
+        async def watch_resources():
+            watcher.check()
+        scheduler.add_job("watch-resources", watch_resources, options["watch_resources_interval"], jitter=0)
+
+    app["scheduler"] = scheduler
+    app["membership_providers"] = providers
+    return scheduler
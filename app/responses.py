@@ -44,3 +44,12 @@ def not_modified():
     return web.Response(text="Not mofidifed",
                         status=304,
                         content_type=PLAIN_TYPE)
+
+
+def service_unavailable(retry_after=None):
+    response = web.Response(text="Service unavailable",
+                            status=503,
+                            content_type=PLAIN_TYPE)
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return response
@@ -1,15 +1,21 @@
 from aiohttp import web
-from app.responses import not_implemented
+from app.handlers.areas import Area
+from app.handlers.login import login as area_login
+from bll.admin.membership import AdminMembershipProvider
+
+admin = Area("admin", membership_provider=AdminMembershipProvider())
+
 
 async def dashboard(request):
     return web.Response(text="dashboard")
 
 
+@admin
 async def login(request):
     """
     Handles a post request for login to the administrative area.
     """
-    return not_implemented()
+    return await area_login(admin, request)
 
 
 def setup_admin_routes(app):
@@ -1,7 +1,7 @@
 from aiohttp import web
-from aiohttp_jinja2 import render_template
-from app.responses import not_implemented
+from app.helpers.rendering import render_template
 from app.handlers.areas import Area
+from app.handlers.login import login as area_login
 from app.handlers.localization import get_best_culture
 from bll.public.membership import PublicMembershipProvider
 
@@ -9,9 +9,11 @@ public = Area("public", membership_provider=PublicMembershipProvider())
 
 
 @public
+@public.cache(ttl=60)
 async def index(request):
     """
-    Returns the main page of the public area.
+    Returns the main page of the public area; the page is the same for all anonymous users of a culture, so it is
+    served from cache to them.
     """
     return render_template("index.html", request, {})
 
@@ -43,7 +45,7 @@ async def login(request):
     """
     Handles a login POST request for the public area of the application.
     """
-    return not_implemented()
+    return await area_login(public, request)
 
 
 def setup_public_routes(app):
@@ -1,18 +1,59 @@
 import asyncio
 import logging
 import pathlib
+import signal
 import jinja2
 import aiohttp_jinja2
 from aiohttp import web
 from app import configuration
 from app.routes import setup_routes
+from app.routes.public import public
+from app.routes.admin import admin
+from app.jobs import setup_jobs, flush_session_touches
 from app.helpers.global_helpers import setup_global_helpers
+from app.helpers.rendering import setup_translations, get_template_options, load_templates
 from app.handlers.security.errors import errors_middleware
 from app.handlers.cookies import cookies_middleware
-from dal import bootstrap as bootstrap_dal
+from app.handlers.admission import setup_admission
+from dal import bootstrap as bootstrap_dal, close_pg
+from dal.batching import flush_batchers
 
 
 PROJ_ROOT = pathlib.Path(__file__).parent
+logger = logging.getLogger(__name__)
+
+
+async def start_database(app):
+    await bootstrap_dal(configuration, app.loop)
+
+
+async def start_templates(app):
+    if not configuration.development:
+        # templates are compiled (or read from the bytecode cache) before serving requests
+        load_templates(app)
+
+
+async def start_scheduler(app):
+    scheduler = setup_jobs(app, {
+        "public": public.membership,
+        "admin": admin.membership
+    })
+    scheduler.start()
+
+
+async def stop_scheduler(app):
+    await app["scheduler"].stop()
+
+
+async def flush_pending_writes(app):
+    # writes collected in memory must be completed before the application stops
+    await flush_session_touches(app["membership_providers"].values())
+    await flush_batchers()
+
+
+async def close_database(app):
+    # close the pooled connections, instead of leaving them to be timed out by the database server
+    await close_pg()
 
 
 async def init(loop):
@@ -21,29 +62,69 @@ async def init(loop):
 
     setattr(app, "config", configuration)
     # configure jinja 2 rendering engine
-    aiohttp_jinja2.setup(app, loader=jinja2.PackageLoader("app", "templates"))
+    aiohttp_jinja2.setup(app, loader=jinja2.PackageLoader("app", "templates"), **get_template_options())
     setup_global_helpers(app)
-
-    await bootstrap_dal(configuration, loop)
+    setup_translations(app)
 
     # setup routes
     setup_routes(app, PROJ_ROOT)
     # setup middlewares
     app.middlewares.append(cookies_middleware)
     app.middlewares.append(errors_middleware)
+    setup_admission(app, [public.name, admin.name])
+    # setup startup hooks: the database client is ready before periodic jobs start
+    app.on_startup.append(start_templates)
+    app.on_startup.append(start_database)
+    app.on_startup.append(start_scheduler)
+    # setup cleanup hooks, executed after in-flight requests are completed:
+    # jobs are stopped, pending writes are flushed, and then the database client is closed
+    app.on_cleanup.append(stop_scheduler)
+    app.on_cleanup.append(flush_pending_writes)
+    app.on_cleanup.append(close_database)
 
     host, port = configuration.host, configuration.port
     return app, host, port
 
 
+def run_server(app, host, port, shutdown_timeout=60.0):
+    """
+    Runs the application until SIGINT or SIGTERM is received, then shuts it down gracefully: the server stops
+    accepting connections, in-flight requests are completed within shutdown_timeout seconds, and the cleanup hooks are
+    executed.
+
+    Unlike web.run_app, connections are accepted only after the startup hooks are completed, and SIGTERM (sent by
+    process managers on deploy) is handled like SIGINT.
+    """
+    loop = app.loop
+    loop.run_until_complete(app.startup())
+
+    handler = app.make_handler()
+    srv = loop.run_until_complete(loop.create_server(handler, host, port))
+    logger.info("Running on http://%s:%s/", host, port)
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, loop.stop)
+    try:
+        loop.run_forever()
+    finally:
+        logger.info("Shutting down: waiting up to %s seconds for in-flight requests", shutdown_timeout)
+        srv.close()
+        loop.run_until_complete(srv.wait_closed())
+        loop.run_until_complete(app.shutdown())
+        loop.run_until_complete(handler.finish_connections(shutdown_timeout))
+        loop.run_until_complete(app.cleanup())
+    loop.close()
+
+
 def main():
     # init logging
     logging.basicConfig(level=logging.DEBUG)
 
     loop = asyncio.get_event_loop()
     app, host, port = loop.run_until_complete(init(loop))
-    web.run_app(app, host=host, port=port)
+    shutdown_timeout = configuration.shutdown_timeout if "shutdown_timeout" in configuration else 60.0
+    run_server(app, host, port, shutdown_timeout)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,60 @@
+"""
+ This module contains the compilation and the loading of the binary translation catalogs of the application.
+
+ Translations are defined as Python dictionaries, compiled into a catalog file for each culture; at runtime, catalogs
+ are memory-mapped on first use. Catalogs are compiled at startup if missing or older than their source module,
+ or ahead of time, with the compiletranslations.py script.
+"""
+import logging
+import os
+from importlib.util import find_spec
+from app.translations.regional import regional, get_regional
+from core.localization.catalogs import Catalog, write_catalog
+from core.localization.tables import build_tables
+
+
+logger = logging.getLogger(__name__)
+
+catalogs_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalogs")
+
+
+def get_catalog_path(culture):
+    return os.path.join(catalogs_path, culture + ".mo")
+
+
+def is_stale(culture):
+    """
+    Returns a value indicating whether the catalog of a culture is missing, or older than its source module or than
+    the module building translation tables.
+    """
+    catalog_path = get_catalog_path(culture)
+    if not os.path.exists(catalog_path):
+        return True
+    catalog_time = os.path.getmtime(catalog_path)
+    return any(os.path.getmtime(find_spec(name).origin) > catalog_time
+               for name in (regional[culture], build_tables.__module__))
+
+
+def compile_catalogs():
+    """
+    Compiles the catalogs of all cultures; keys missing in some cultures are detected and logged here.
+
+    :return: dictionary of sorted missing keys by culture
+    """
+    tables, missing = build_tables({culture: get_regional(culture) for culture in regional})
+    os.makedirs(catalogs_path, exist_ok=True)
+    for culture, table in tables.items():
+        write_catalog(get_catalog_path(culture), table)
+        logger.info("Compiled %d translations for `%s`", len(table), culture)
+    for culture, keys in sorted(missing.items()):
+        logger.warning("Missing translations for `%s`: %s", culture, ", ".join(keys))
+    return missing
+
+
+def load_catalogs():
+    """
+    Returns the translation catalogs by culture, compiling them if necessary; catalogs are opened on first use.
+    """
+    if any(is_stale(culture) for culture in regional):
+        compile_catalogs()
+    return {culture: Catalog(get_catalog_path(culture)) for culture in regional}
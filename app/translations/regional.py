@@ -1,11 +1,18 @@
 """
-    Regional object
+    Regional object: the modules defining the translations of each culture, by culture.
+    Modules are imported only to compile translation catalogs (see app.translations.catalogs).
 """
-from app.translations.en import en
-from app.translations.it import it
+import importlib
 
 regional = {
-    "en": en,
-    "it": it
+    "en": "app.translations.en",
+    "it": "app.translations.it"
 }
 
+
+def get_regional(culture):
+    """
+    Returns the dictionary of nested translations of a culture, defined by its module with the culture name.
+    """
+    module = importlib.import_module(regional[culture])
+    return getattr(module, culture)
@@ -0,0 +1,30 @@
+from bll.membership import MembershipProvider, Principal, Identity
+from dal.admin.membership import AdminMembershipStore
+
+
+__all__ = ["AdminMembershipProvider", "AdminPrincipal", "AdminIdentity"]
+
+
+class AdminMembershipProvider(MembershipProvider):
+    """
+    Represents a MembershipProvider for the administrative area of the website.
+    """
+    def get_membership_store(self):
+        return AdminMembershipStore()
+
+    def get_principal_type(self):
+        return AdminPrincipal
+
+
+class AdminPrincipal(Principal):
+    """
+    Represents an administrative principal
+    """
+    def get_identity_type(self):
+        return AdminIdentity
+
+
+class AdminIdentity(Identity):
+    """
+    Represents an administrative user.
+    """
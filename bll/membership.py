@@ -3,8 +3,7 @@
 
  This module contains core classes for authentication and authorization strategies, and session management.
 """
-import random
-import hashlib
+import asyncio
 import re
 import datetime
 import uuid
@@ -12,6 +11,11 @@ from collections import OrderedDict, namedtuple
 from core import require_params
 from core.collections.bunch import Bunch
 from core.exceptions import ArgumentNullException, InvalidOperation
+from bll.sessioncache import SessionCache
+from bll.sessiontouch import SessionTouchBuffer
+from bll.passwords import PasswordHasher, get_executor
+from bll.throttling import SlidingWindowLimiter
+from bll.sessiondata import SessionData, serialize, deserialize
 
 
 AuthenticationResult = namedtuple("AuthenticationResult", ["principal", "session"])
@@ -28,6 +32,14 @@ class Session:
         self.expiration = expiration
         self.anonymous = anonymous
 
+    @property
+    def transient(self):
+        """
+        Returns a value indicating whether this session is not stored in the persistence layer.
+        Anonymous sessions are transient until something requires their materialization (see lazy_anonymous_sessions).
+        """
+        return self.id is None
+
     @classmethod
     def from_dict(cls, data):
         """
@@ -38,7 +50,7 @@ class Session:
         """
         return cls(data.get("id"),
                    data.get("guid"),
-                   data.get("userkey"),
+                   data.get("userkey", data.get("user_id")),
                    data.get("expiration_time"),
                    data.get("anonymous"))
 
@@ -152,8 +164,21 @@ class MembershipProvider:
         "short_time_expiration": 1e3 * 60 * 20,
         "long_time_expiration": 1e3 * 60 * 60 * 24 * 365,
         "failed_login_attempts_limit": 4,
+        "failed_login_attempts_limit_by_ip": 20,
         "minutes_limit": 15,
-        "requires_account_confirmation": False
+        "requires_account_confirmation": False,
+        "lazy_anonymous_sessions": True,  # whether anonymous sessions are stored only when necessary
+        "session_cache_size": 10000,  # maximum number of sessions kept in memory; 0 to disable the cache
+        "session_cache_ttl": 60,  # seconds
+        "login_attempts_retention": 60 * 24 * 7,  # minutes
+        "purge_batch_size": 1000,
+        "purge_max_batches": 100,
+        "sliding_expiration": False,  # whether active sessions are extended by the sliding expiration window
+        "sliding_expiration_window": None,  # milliseconds; if None, short_time_expiration is used
+        "session_touch_interval": 30,  # seconds between bulk updates of sliding expiration times
+        "password_hash_iterations": 100000,  # cost of the password key derivation
+        "password_hashing_executor": "thread",  # "thread" or "process"
+        "password_hashing_workers": None  # maximum number of hashing workers; None for the executor default
     }
 
     def __init__(self):
@@ -165,9 +190,18 @@ class MembershipProvider:
         params = dict(self.defaults, **options)
         self.validate_store(store)
         self.store = store
+        # whether the store can read session and account data with a single query
+        self.combined_session_lookup = callable(getattr(store, "get_session_and_account", None))
         self.options = Bunch()
         self.options.merge(params)
         self.principal_type = self.get_principal_type()
+        self.session_cache = SessionCache(self.options.session_cache_size, self.options.session_cache_ttl) \
+            if self.options.session_cache_size else None
+        self.session_touches = SessionTouchBuffer()
+        self.password_hasher = self.get_password_hasher()
+        window = self.options.minutes_limit * 60
+        self.failed_logins_by_userkey = SlidingWindowLimiter(self.options.failed_login_attempts_limit, window)
+        self.failed_logins_by_ip = SlidingWindowLimiter(self.options.failed_login_attempts_limit_by_ip, window)
 
     def get_membership_store(self):
         """
@@ -192,27 +226,15 @@ class MembershipProvider:
         """
         return Principal
 
-    @staticmethod
-    def get_hash(password, salt):
+    def get_password_hasher(self):
         """
-        Returns an hashed version of password, created using the given salt
+        Returns the object used to hash and verify passwords.
 
-        :param password: original password, to obfuscate with the given salt
-        :param salt: salt to use to hash a password
-        :return: hashed version of password
+        This method can be implemented to use a different key derivation function.
         """
-        key = (password + salt).encode("utf-8")
-        return hashlib.sha224(key).hexdigest()
-
-    @staticmethod
-    def get_new_salt():
-        """
-        Returns a new salt to be used to hash password
-
-        :return: {String} new salt to be used to hash passwords
-        """
-        alphabet = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
-        return ''.join(random.choice(alphabet) for _ in range(16))
+        options = self.options
+        return PasswordHasher(options.password_hash_iterations,
+                              get_executor(options.password_hashing_executor, options.password_hashing_workers))
 
     @staticmethod
     def validate_store(store):
@@ -222,6 +244,7 @@ class MembershipProvider:
         """
         # TODO: use abstract class!?
         req = ["get_account",
+               "get_account_by_key",
                "get_accounts",
                "get_session",
                "get_session_by_guid",
@@ -237,53 +260,52 @@ class MembershipProvider:
             if not hasattr(store, name):
                 raise Exception("The given store does not implement `" + name + "` member")
 
-    def get_account(self, userkey):
+    async def get_account(self, userkey):
         """
         Gets the account with the given key.
         :param userkey: key of the user (e.g. email or username)
         """
-        data = self.store.get_account(userkey)
+        data = await self.store.get_account_by_key(userkey)
         if data is None:
             return None
         result = Bunch()
-        result.merge(data)
+        result.merge(dict(data))
         return result
 
-    def get_account_by_id(self, account_id):
+    async def get_account_by_id(self, account_id):
         """
         Gets the account details by id
         :param account_id: account id
         :return: account
         """
-        data = self.store.get_account_by_id(account_id)
+        data = await self.store.get_account(account_id)
         if data is None:
             return None
-        del data["salt"]
-        del data["hash"]
+        data = self.prepare_account_data(dict(data))
         result = Bunch()
         result.merge(data)
         return result
 
-    def get_accounts(self, options):
+    async def get_accounts(self, options):
         """
         Gets the list of all application accounts.
         """
         # define searchable properties
         options["search_properties"] = ["email", "roles"]
-        data = self.store.get_accounts(options)
+        data = await self.store.get_accounts(options)
         # NB !!!
         # Salt and hashed password must be kept private in this case.
         for item in data.subset:
             self.prepare_account_data(item)
         return data
 
-    def get_sessions(self, options):
+    async def get_sessions(self, options):
         """
         Gets the list of current user sessions.
         """
         # define searchable properties
         options["search_properties"] = ["email", "client_data.user_agent", "client_ip"]
-        data = self.store.get_sessions(options)
+        data = await self.store.get_sessions(options)
         for o in data.subset:
             if o["client_data"]:
                 o["user_agent"] = o["client_data"]["user_agent"]
@@ -297,8 +319,8 @@ class MembershipProvider:
         Prepares account data, to share it outside of bll.
         Salt and hashed password must be never get out of bll.
         """
-        del account["salt"]
-        del account["hash"]
+        account.pop("salt", None)
+        account.pop("hashed_password", None)
         if "roles" not in account:
             account["roles"] = []
         return account
@@ -311,7 +333,7 @@ class MembershipProvider:
     def get_account_defaults(self):
         return {}
 
-    def create_account(self, userkey, password, data=None, roles=None, lang="en"):
+    async def create_account(self, userkey, password, data=None, roles=None, lang="en"):
         """
         Creates a new user account.
 
@@ -324,43 +346,39 @@ class MembershipProvider:
             return False, "InvalidParameter"
 
         # verify that an account with the same key doesn't exist already
-        account_data = self.store.get_account(userkey)
+        account_data = await self.store.get_account_by_key(userkey)
         if account_data is not None:
             return False, "AccountAlreadyExisting"
         if data is None:
             data = {}
         if roles is None:
             roles = []
-        salt = self.get_new_salt()
-        hashedpassword = self.get_hash(password, salt)
+        salt = self.password_hasher.get_new_salt()
+        hashedpassword = await self.password_hasher.get_hash(password, salt)
         data = dict(self.get_account_defaults(), **data)
 
         if self.options.requires_account_confirmation:
-            # set a confirmation token inside the account data
-            confirmation_token = str(uuid.uuid1())
-            data["confirmation_token"] = confirmation_token
+            # set a confirmation key inside the account data
+            data["confirmation_key"] = str(uuid.uuid1())
 
-        account_data = self.store.create_account(userkey, hashedpassword, salt, data, roles)
+        account_data = await self.store.create_account(userkey, hashedpassword, salt, data, roles)
 
         # TODO: if desired, implement send email logic
         return True, account_data
 
-    def is_password_correct(self, account_id, password):
+    async def is_password_correct(self, account_id, password):
         require_params(account_id=account_id, password=password)
 
         if not self.validate_password(password):
             return False
 
-        account_data = self.store.get_account_by_id(account_id)
+        account_data = await self.store.get_account(account_id)
         if account_data is None:
             raise ValueError("AccountNotFound")
 
-        hsh = self.get_hash(password, account_data["salt"])
-        if account_data["hash"] != hsh:
-            return False
-        return True
+        return await self.password_hasher.verify(password, account_data["salt"], account_data["hashed_password"])
 
-    def update_password(self, userkey, password):
+    async def update_password(self, userkey, password):
         """
         Updates the password for the account with the given key.
 
@@ -371,96 +389,114 @@ class MembershipProvider:
         if not self.validate_userkey(userkey) or not self.validate_password(password):
             return False, "InvalidParameter"
 
-        account_data = self.store.get_account(userkey)
+        account_data = await self.store.get_account_by_key(userkey)
         if account_data is None:
             return False, "Account not found"
-        salt = account_data["salt"]
-        hashedpassword = self.get_hash(password, salt)
-        self.store.update_account(userkey, {"hash": hashedpassword})
+        await self.set_password(account_data["id"], password)
         return True, ""
 
-    def delete_account(self, userkey):
+    async def set_password(self, account_id, password):
+        """
+        Hashes the given password with a new salt, and stores it for the account with the given id.
+
+        :param account_id: account id
+        :param password: account clear password
+        """
+        salt = self.password_hasher.get_new_salt()
+        hashedpassword = await self.password_hasher.get_hash(password, salt)
+        # commit the change:
+        await self.store.change_password(account_id, hashedpassword, salt)
+        if self.session_cache is not None:
+            self.session_cache.invalidate_account(account_id)
+
+    async def delete_account(self, userkey):
         """
         Deletes the account with the given userkey
         :param userkey: the user key (email address or username)
         :return: success, error
         """
-        account = self.store.get_account(userkey)
+        account = await self.store.get_account_by_key(userkey)
         if account is None:
             return False, "AccountNotFound"
-        self.store.delete_account(userkey)
+        await self.store.delete_account_by_id(account["id"])
+        if self.session_cache is not None:
+            self.session_cache.invalidate_account(account["id"])
         return True, None
 
-    def delete_account_with_validation(self, account_id, current_password, lang="en"):
+    async def delete_account_with_validation(self, account_id, current_password, lang="en"):
         """
         Deletes the account with the given id, validating its password.
         :param account_id:
         :param current_password:
         :return:
         """
-        account = self.store.get_account_by_id(account_id)
+        account = await self.store.get_account(account_id)
         if account is None:
             return False, "AccountNotFound"
-        hsh = self.get_hash(current_password, account["salt"])
-        if account.get("hash") != hsh:
+        if not await self.password_hasher.verify(current_password, account["salt"], account["hashed_password"]):
             return False, "InvalidPassword"
 
         # delete the account
-        deleted = self.store.delete_account_by_id(account_id)
+        deleted = await self.store.delete_account_by_id(account_id)
         if not deleted:
             return False, "NoDocumentDeleted"
+        if self.session_cache is not None:
+            self.session_cache.invalidate_account(account_id)
 
         # TODO: if desired, implement farewell email here
         return True, None
 
-    def confirm_account(self, account_id, confirmation_token):
+    async def confirm_account(self, account_id, confirmation_token):
         """
         Confirms the account with the given id and using the given confirmation token.
         """
-        if not account_id or account_id.isspace():
+        if not account_id:
             raise ArgumentNullException("account_id")
         if not confirmation_token or confirmation_token.isspace():
             raise ArgumentNullException("confirmation_token")
 
-        account_data = self.store.get_account_by_id(account_id)
+        account_data = await self.store.get_account(account_id)
         if not account_data:
             raise ValueError("Account not found")
 
-        if account_data.get("confirmed") is True:
+        if account_data["confirmation_key"] is None:
+            # the account is already confirmed
             return True
 
-        if account_data.get("confirmation_token") != confirmation_token:
+        if str(account_data["confirmation_key"]) != confirmation_token:
             raise ValueError("Invalid confirmation token for account `%s`" % account_id)
 
-        self.store.update_account_by_id(account_id, {
-            "confirmed": True
-        }, unset_data={"confirmation_token": ""})
+        await self.store.update_account_by_id(account_id, {
+            "confirmation_key": None
+        })
         return True
 
-    def ban_account(self, userkey):
+    async def ban_account(self, userkey):
         """
         Bans the account with the given userkey.
         :param userkey: the user key (email address or username)
         :return: success, error
         """
-        return self.update_account(userkey, {
+        return await self.update_account(userkey, {
             "banned": True
         })
 
-    def update_account(self, userkey, data):
+    async def update_account(self, userkey, data):
         """
         Updates the account with the given key; setting the data.
         :param userkey: the user key (email address or username)
         :param data: account data to update
         :return: self
         """
-        account = self.store.get_account(userkey)
+        account = await self.store.get_account_by_key(userkey)
         if account is None:
             return False, "AccountNotFound"
-        self.store.update_account(userkey, data)
+        await self.store.update_account(userkey, data)
+        if self.session_cache is not None:
+            self.session_cache.invalidate_account(account["id"])
         return True, None
 
-    def try_login(self, userkey, password, remember, client_ip, client_data=None, check_password=True):
+    async def try_login(self, userkey, password, remember, client_ip, client_data=None, check_password=True):
         """
         Tries to perform a login for the user with the given key (e.g. email or username); password;
         :param userkey: the user key (email address or username)
@@ -468,85 +504,111 @@ class MembershipProvider:
         :param remember: whether to have a longer expiration time or not
         :param client_ip: ip of the client for which the function has been called
         :param client_data: optional client data
-        :param options: extra options
+        :param check_password: whether to check the password
         :return:
         """
+        if check_password and self.is_login_throttled(userkey, client_ip):
+            # error: too many attempts in the last minutes, for this user or from this client;
+            # the request is refused before any query or password hashing
+            return False, "TooManyAttempts"
+
         # get account data
-        account_data = self.get_account(userkey)
+        account_data = await self.get_account(userkey)
         if account_data is None:
+            if check_password:
+                self.record_failed_login(userkey, client_ip)
+                # spend the same time of a wrong password, not to disclose which accounts exist
+                await self.password_hasher.get_hash(password or "", self.password_hasher.get_new_salt())
             return False, "WrongCombo"
 
-        login_attempts = self.get_failed_login_attempts(userkey)
-        too_many_attempts = self.options.failed_login_attempts_limit <= login_attempts
-        if too_many_attempts:
-            # log information
-
-            return False, "TooManyAttempts"
-            # error: too many attempts in the last minutes, for this user
-
         if check_password:
-            # generate hash of given password, appending salt
-            hsh = self.get_hash(password, account_data.salt)
-            if account_data.hash != hsh:
+            # generate hash of given password, with the salt of the account
+            hasher = self.password_hasher
+            if not await hasher.verify(password, account_data.salt, account_data.hashed_password):
                 # the key exists, but the password is wrong
-                self.report_login_attempt(userkey, client_ip)
+                self.record_failed_login(userkey, client_ip)
+                await self.report_login_attempt(account_data.id, client_ip, client_data)
                 # exit
                 return False, "WrongCombo"
 
+            self.failed_logins_by_userkey.reset(userkey)
+
+            if hasher.needs_rehash(account_data.salt):
+                # the password was hashed with previous parameters
+                await self.set_password(account_data.id, password)
+
         # check if the account is confirmed
-        if self.options.requires_account_confirmation and not account_data.confirmed:
+        if self.options.requires_account_confirmation and account_data.confirmation_key is not None:
             return False, "RequireConfirmation"
 
         # check if the account was banned
-        if hasattr(account_data, "banned") and account_data.banned is True:
+        if account_data.get("banned") is True:
             return False, "BannedAccount"
 
         # get session expiration
         expiration = self.get_new_expiration(remember)
         # save session
-        session = self.store.create_session(userkey, expiration, client_ip, client_data)
+        session = await self.store.create_session(account_data.id, expiration, client_ip, client_data)
         session = Session.from_dict(session)
 
-        del account_data.salt
-        del account_data.hash
+        account_data = self.prepare_account_data(dict(account_data.__dict__))
         principal = self.principal_type
 
         # TODO: if desired, implement sending of email here "new login from..."
 
         return True, AuthenticationResult(
-            principal(account_data.id,
+            principal(account_data["id"],
                       account_data,
                       session,
                       True),
             session
         )
 
-    def report_login_attempt(self, userkey, client_ip):
+    def is_login_throttled(self, userkey, client_ip):
         """
-        Reports a login attempt, storing it in the persistence layer.
+        Returns a value indicating whether login attempts for the given user key, or from the given client ip,
+        must be refused because of too many failed attempts in the last minutes (minutes_limit option).
 
-        :param userkey: the user key (email address or username)
+        Failed attempts are counted in memory, by each process.
+        """
+        return self.failed_logins_by_userkey.is_limited(userkey) or \
+            (client_ip is not None and self.failed_logins_by_ip.is_limited(client_ip))
+
+    def record_failed_login(self, userkey, client_ip):
+        """
+        Records a failed login attempt in the in-memory limiters.
+        """
+        self.failed_logins_by_userkey.hit(userkey)
+        if client_ip is not None:
+            self.failed_logins_by_ip.hit(client_ip)
+
+    async def report_login_attempt(self, account_id, client_ip, client_data=None):
+        """
+        Reports a failed login attempt, storing it in the persistence layer.
+
+        :param account_id: id of the account
         :param client_ip: ip of the client
+        :param client_data: information about the client software
         """
         now = datetime.datetime.utcnow()
-        self.store.save_login_attempt(userkey, client_ip, now)
+        await self.store.save_login_attempt(account_id, client_ip, now, client_data)
         return self
 
-    def validate_password_reset_token(self, account_id, token):
-        account_data = self.store.get_account_by_id(account_id)
+    async def validate_password_reset_token(self, account_id, token):
+        account_data = await self.store.get_account(account_id)
         if account_data is None:
             return False, "AccountNotFound"
 
-        password_reset_token = account_data.get("passwordResetToken")
-        if not password_reset_token or password_reset_token.isspace():
+        password_reset_token = account_data["password_reset_key"]
+        if not password_reset_token:
             return False, "MissingPasswordResetToken"
 
-        if password_reset_token != token:
+        if str(password_reset_token) != token:
             return False, "InvalidToken"
 
         return True, None
 
-    def change_password(self, account_id, current_password, password_one, password_two):
+    async def change_password(self, account_id, current_password, password_one, password_two):
         """
         This function is used when a user wants to change a password, using the current password
         """
@@ -555,12 +617,12 @@ class MembershipProvider:
                        password_one=password_one,
                        password_two=password_two)
 
-        account_data = self.store.get_account_by_id(account_id)
+        account_data = await self.store.get_account(account_id)
         if account_data is None:
             raise InvalidOperation("Account not found")
 
         # validate current password
-        if not self.is_password_correct(account_id, current_password):
+        if not await self.is_password_correct(account_id, current_password):
             raise ValueError("WrongPassword")
 
         # validate passwords
@@ -569,13 +631,10 @@ class MembershipProvider:
             raise ValueError("Passwords are not valid: " + error)
 
         # update account password
-        salt = self.get_new_salt()
-        hashedpassword = self.get_hash(password_one, salt)
-        # commit the change:
-        self.store.change_password(account_id, hashedpassword, salt)
+        await self.set_password(account_id, password_one)
         return True, None
 
-    def commit_password_reset(self, account_id, token, password_one, password_two):
+    async def commit_password_reset(self, account_id, token, password_one, password_two):
         """
         This function is used when a user requested a password change, using a token that was sent by email.
         It validates a token that was set previously.
@@ -591,15 +650,12 @@ class MembershipProvider:
                        password_one=password_one,
                        password_two=password_two)
 
-        account_data = self.store.get_account_by_id(account_id)
-        if account_data is None:
-            raise InvalidOperation("Account not found")
-
-        password_reset_token = account_data.get("passwordResetToken")
-        if not password_reset_token or password_reset_token.isspace():
-            raise InvalidOperation("Password reset token not initialized")
-
-        if password_reset_token != token:
+        valid_token, error = await self.validate_password_reset_token(account_id, token)
+        if not valid_token:
+            if error == "AccountNotFound":
+                raise InvalidOperation("Account not found")
+            if error == "MissingPasswordResetToken":
+                raise InvalidOperation("Password reset token not initialized")
             raise ValueError("Invalid password reset token")
 
         # validate passwords
@@ -607,21 +663,22 @@ class MembershipProvider:
         if not valid_passwords:
             raise ValueError("Passwords are not valid: " + error)
 
-        salt = self.get_new_salt()
-        hashedpassword = self.get_hash(password_one, salt)
-        # commit the change:
-        self.store.change_password(account_id, hashedpassword, salt)
+        await self.set_password(account_id, password_one)
+        await self.store.update_account_by_id(account_id, {
+            "password_reset_key": None
+        })
         return True
 
-    def get_failed_login_attempts(self, userkey):
+    async def get_failed_login_attempts(self, account_id):
         """
-        Gets the number of failed login attempts for a userkey in the amount of minutes defined by MinutesLimit option.
-        :param userkey: the user key (email address or username)
+        Gets the number of failed login attempts for an account in the amount of minutes defined by MinutesLimit
+        option.
+        :param account_id: id of the account
         """
         now = datetime.datetime.utcnow()
         ms = self.options.minutes_limit * 60 * 1e3
         start = now - datetime.timedelta(milliseconds=ms)
-        count = self.store.get_failed_login_attempts(userkey, start, now)
+        count = await self.store.get_failed_login_attempts(account_id, start, now)
         return count
 
     async def try_login_by_session_key(self, sessionkey):
@@ -634,16 +691,34 @@ class MembershipProvider:
         if sessionkey is None:
             return False, None
 
-        session = await self.store.get_session_by_guid(sessionkey)
-        if session is None:
-            return False, None
+        cache = self.session_cache
+        cached = cache.get(sessionkey) if cache is not None else None
+        if cached is not None:
+            session_data, account = cached
+        else:
+            loaded = await self.load_session(sessionkey)
+            if loaded is None:
+                return False, None
+            session_data, account = loaded
 
         # convert into a class
-        session = Session.from_dict(session)
+        session = Session.from_dict(session_data)
 
         now = datetime.datetime.utcnow()
         if session.expiration < now:
+            if cached is not None:
+                cache.invalidate_session(sessionkey)
+            return False, None
+
+        if not session.anonymous and account is None:
             return False, None
+
+        if self.options.sliding_expiration:
+            self.slide_expiration(session, session_data, now)
+
+        if cached is None and cache is not None:
+            cache.set(sessionkey, session_data, account)
+
         principal_type = self.principal_type
         if session.anonymous:
             return True, AuthenticationResult(
@@ -654,14 +729,7 @@ class MembershipProvider:
                 session
             )
 
-        # get account data
-        account = await self.store.get_account(session.userkey)
-
-        if account is None:
-            return False, None
-
         # return session and account data
-        principal_type = self.principal_type
         return True, AuthenticationResult(
             principal_type(account["id"],
                            account,
@@ -670,6 +738,70 @@ class MembershipProvider:
             session
         )
 
+    def slide_expiration(self, session, session_data, now):
+        """
+        Extends the expiration of an active session by the sliding expiration window; when less than half of the
+        window remains. The new expiration is recorded in memory and written by flush_session_touches.
+
+        :param session: session.
+        :param session_data: session data, in dictionary (updated in place, like cached data).
+        :param now: current utc time.
+        """
+        window = datetime.timedelta(milliseconds=self.options.sliding_expiration_window or
+                                    self.options.short_time_expiration)
+        if session.expiration - now >= window / 2:
+            return
+        expiration = now + window
+        if expiration <= session.expiration:
+            return
+        session.expiration = expiration
+        session_data["expiration_time"] = expiration
+        self.session_touches.touch(session.guid, expiration)
+
+    async def flush_session_touches(self):
+        """
+        Writes the recorded sliding expiration times to the persistence layer, with a bulk update.
+
+        :return: the number of touched sessions
+        """
+        expirations = self.session_touches.drain()
+        if not expirations:
+            return 0
+        try:
+            await self.store.touch_sessions(expirations)
+        except Exception:
+            self.session_touches.restore(expirations)
+            raise
+        return len(expirations)
+
+    async def load_session(self, sessionkey):
+        """
+        Loads the data of the session with the given key, and of its account, from the persistence layer.
+        If the store supports it, session and account are read with a single query.
+
+        :param sessionkey: the key of the session
+        :return: None if the session does not exist or is expired; otherwise session data, account data
+        """
+        if self.combined_session_lookup:
+            result = await self.store.get_session_and_account(sessionkey)
+            if result is None:
+                return None
+            session_data, account, expired = result
+            if expired:
+                return None
+            return session_data, account
+
+        session_data = await self.store.get_session_by_guid(sessionkey)
+        if session_data is None:
+            return None
+        session_data = dict(session_data)
+        if session_data.get("anonymous"):
+            return session_data, None
+
+        # get account data
+        account = await self.store.get_account(session_data.get("user_id"))
+        return session_data, dict(account) if account is not None else None
+
     async def initialize_anonymous_session(self, client_ip, client_data):
         """
         Initializes a session for an anonymous user.
@@ -688,6 +820,52 @@ class MembershipProvider:
             session
         )
 
+    def initialize_transient_session(self):
+        """
+        Initializes an anonymous session that is not stored in the persistence layer.
+        The session can be represented by a signed cookie, and materialized later, if necessary.
+        """
+        session = Session(None, uuid.uuid4(), None, self.get_new_expiration(True), True)
+        return AuthenticationResult(
+            self.principal_type(None, None, session, False),
+            session
+        )
+
+    def restore_transient_session(self, session_guid, expiration):
+        """
+        Restores an anonymous session that is not stored in the persistence layer, from its guid and expiration.
+
+        :param session_guid: guid of the session.
+        :param expiration: expiration time of the session.
+        :return: boolean, authentication result
+        """
+        if expiration < datetime.datetime.utcnow():
+            return False, None
+        session = Session(None, session_guid, None, expiration, True)
+        return True, AuthenticationResult(
+            self.principal_type(None, None, session, False),
+            session
+        )
+
+    async def materialize_session(self, session, client_ip, client_data):
+        """
+        Stores a transient anonymous session in the persistence layer, keeping its guid and expiration.
+
+        :param session: transient session.
+        :param client_ip: ip of the client
+        :param client_data: information about the client software
+        :return: session
+        """
+        if not session.transient:
+            return session
+        session_data = await self.store.create_session(None,
+                                                       session.expiration,
+                                                       client_ip,
+                                                       client_data,
+                                                       guid=session.guid)
+        session.id = session_data["id"]
+        return session
+
     def get_new_expiration(self, remember=None):
         """
         Returns the expiration for a new session, based on the provider settings and if the user wants to be remembered.
@@ -703,33 +881,70 @@ class MembershipProvider:
         expiration = now + datetime.timedelta(milliseconds=ms)
         return expiration
 
-    def save_session_data(self, sessionkey, data):
+    async def save_session_data(self, sessionkey, data):
         """
         Stores session data in the database.
         :param sessionkey: the key of the session
         :param data: dictionary of data to store in database
         :return:
         """
-        self.store.save_session_data(sessionkey, data)
+        if isinstance(data, SessionData):
+            data = data.to_dict()
+        await self.store.save_session_data(sessionkey, serialize(data))
         return self
 
-    def get_session_data(self, sessionkey):
+    async def get_session_data(self, sessionkey):
         """
         Gets the data associated with the given session, in database.
         :param sessionkey: the key of the session
-        :return: dict
+        :return: SessionData
         """
-        return self.options.get_session_data(sessionkey)
+        value = await self.store.get_session_data(sessionkey)
+        return SessionData(deserialize(value))
 
-    def destroy_session(self, sessionkey):
+    async def destroy_session(self, sessionkey):
         """
         Destroys the session with the given key.
         :param sessionkey: key of the session to destroy.
         :return: self
         """
-        self.store.destroy_session(sessionkey)
+        await self.store.destroy_session(sessionkey)
+        if self.session_cache is not None:
+            self.session_cache.invalidate_session(sessionkey)
         return self
 
+    async def purge_expired_sessions(self):
+        """
+        Deletes expired sessions from the persistence layer, in bounded batches, to keep the sessions table small
+        without holding locks for a long time.
+
+        :return: the number of deleted sessions
+        """
+        now = datetime.datetime.utcnow()
+        return await self._purge(lambda limit: self.store.delete_expired_sessions(now, limit))
+
+    async def purge_login_attempts(self):
+        """
+        Deletes login attempts older than the login_attempts_retention option (in minutes), in bounded batches.
+
+        :return: the number of deleted login attempts
+        """
+        retention = max(self.options.login_attempts_retention, self.options.minutes_limit)
+        before = datetime.datetime.utcnow() - datetime.timedelta(minutes=retention)
+        return await self._purge(lambda limit: self.store.delete_login_attempts(before, limit))
+
+    async def _purge(self, delete_batch):
+        batch_size = self.options.purge_batch_size
+        total = 0
+        for _ in range(self.options.purge_max_batches):
+            deleted = await delete_batch(batch_size)
+            total += deleted
+            if deleted < batch_size:
+                break
+            # let other coroutines run between batches
+            await asyncio.sleep(0)
+        return total
+
     def validate_new_passwords(self, pass_one, pass_two):
         if pass_one != pass_two:
             return False
@@ -0,0 +1,104 @@
+"""
+ This module contains the password hashing strategy used by membership providers.
+
+ Hashing uses PBKDF2-HMAC with a tunable number of iterations; since it is CPU-bound by design, it is executed in a
+ thread pool or in a process pool, so a burst of logins does not block the event loop serving other requests.
+ The parameters of the key derivation are stored together with the salt, so the cost can be increased without
+ invalidating existing passwords; and passwords hashed with the previous strategy (salted SHA-224) are still verified.
+"""
+import asyncio
+import hashlib
+import hmac
+import random
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+SALT_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+SALT_SEPARATOR = "$"
+
+system_random = random.SystemRandom()
+executors = {}
+
+
+def compute_hash(password, salt):
+    """
+    Returns the hash of a password, using the key derivation parameters described by the given salt.
+    This function is executed in worker threads or processes.
+
+    :param password: clear password.
+    :param salt: salt, in the format algorithm$iterations$random; or a legacy salt without parameters.
+    :return: hexadecimal hash
+    """
+    salt = salt.strip()
+    if SALT_SEPARATOR not in salt:
+        # legacy hash
+        return hashlib.sha224((password + salt).encode("utf-8")).hexdigest()
+    algorithm, iterations, _ = salt.split(SALT_SEPARATOR)
+    hash_name = algorithm.split("_")[1]
+    return hashlib.pbkdf2_hmac(hash_name,
+                               password.encode("utf-8"),
+                               salt.encode("utf-8"),
+                               int(iterations)).hex()
+
+
+def get_executor(kind, workers=None):
+    """
+    Returns the executor shared by password hashers of the same kind, in the current process.
+
+    :param kind: "thread" or "process".
+    :param workers: maximum number of workers of the executor.
+    """
+    key = (kind, workers)
+    executor = executors.get(key)
+    if executor is None:
+        if kind == "thread":
+            executor = ThreadPoolExecutor(max_workers=workers or 4)
+        elif kind == "process":
+            executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            raise ValueError("Invalid password hashing executor: `{}`; use `thread` or `process`.".format(kind))
+        executors[key] = executor
+    return executor
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with PBKDF2-HMAC, outside of the event loop.
+    """
+    algorithm = "pbkdf2_sha256"
+
+    def __init__(self, iterations=100000, executor=None, loop=None):
+        self.iterations = iterations
+        self.executor = executor
+        self.loop = loop
+
+    def get_new_salt(self):
+        """
+        Returns a new salt, including the parameters of the key derivation.
+        """
+        return SALT_SEPARATOR.join((self.algorithm,
+                                    str(self.iterations),
+                                    "".join(system_random.choice(SALT_ALPHABET) for _ in range(16))))
+
+    def needs_rehash(self, salt):
+        """
+        Returns a value indicating whether a password hashed with the given salt should be hashed again with the
+        current parameters (e.g. because the number of iterations was increased).
+        """
+        return salt.strip().split(SALT_SEPARATOR)[:2] != [self.algorithm, str(self.iterations)]
+
+    async def get_hash(self, password, salt):
+        """
+        Returns the hash of a password, computed by the executor.
+        """
+        loop = self.loop or asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, compute_hash, password, salt)
+
+    async def verify(self, password, salt, hashed_password):
+        """
+        Returns a value indicating whether the password matches the given hash.
+        """
+        if not password or not salt or not hashed_password:
+            return False
+        hsh = await self.get_hash(password, salt)
+        return hmac.compare_digest(hsh, hashed_password.strip())
@@ -12,6 +12,12 @@ class PublicMembershipProvider(MembershipProvider):
     def get_membership_store(self):
         return PublicMembershipStore()
 
+    def get_options(self):
+        # active users of the public area stay logged in
+        return {
+            "sliding_expiration": True
+        }
+
     def get_principal_type(self):
         return PublicPrincipal
 
@@ -0,0 +1,93 @@
+"""
+ This module contains the in-process cache of sessions and accounts used by the MembershipProvider, to resolve warm
+ sessions without querying the database.
+
+ The cache is local to each worker process: entries are kept for a short time-to-live, so changes made by other
+ processes (e.g. a ban, or a session destroyed by another worker) are observed after at most ttl seconds.
+ Changes made through the MembershipProvider of the same process invalidate the affected entries immediately.
+"""
+from core.caching import LRUCache
+
+
+class SessionCache:
+    """
+    Bounded, TTL-aware cache of session and account data, by session guid.
+    Keeps an index of cached session guids by account id, to support invalidation when an account changes.
+    """
+    def __init__(self, maxsize=10000, ttl=60):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl, on_evict=self._unindex)
+        self.account_sessions = {}
+
+    @property
+    def hits(self):
+        return self.entries.hits
+
+    @property
+    def misses(self):
+        return self.entries.misses
+
+    def get(self, session_guid):
+        """
+        Returns a tuple of session data and account data for the given session guid, or None if not cached.
+
+        :param session_guid: guid of the session.
+        """
+        return self.entries.get(str(session_guid))
+
+    def set(self, session_guid, session_data, account_data=None):
+        """
+        Stores session data and account data (None for anonymous sessions) for the given session guid.
+
+        :param session_guid: guid of the session.
+        :param session_data: session data, in dictionary.
+        :param account_data: account data, in dictionary.
+        """
+        key = str(session_guid)
+        previous = self.entries.peek(key)
+        if previous is not None:
+            self._unindex(key, previous)
+        self.entries.set(key, (session_data, account_data))
+        if account_data is not None:
+            self.account_sessions.setdefault(account_data["id"], set()).add(key)
+
+    def invalidate_session(self, session_guid):
+        """
+        Removes the session with the given guid from cache.
+
+        :param session_guid: guid of the session.
+        """
+        key = str(session_guid)
+        item = self.entries.peek(key)
+        self.entries.delete(key)
+        if item is not None:
+            self._unindex(key, item)
+
+    def invalidate_account(self, account_id):
+        """
+        Removes all the cached sessions of the account with the given id.
+
+        :param account_id: id of the account.
+        """
+        for key in self.account_sessions.pop(account_id, ()):
+            self.entries.delete(key)
+
+    def _unindex(self, key, item):
+        """
+        Removes the key of an entry from the index of sessions by account id; called also for entries evicted by the
+        cache, so the index never grows beyond the cache size.
+        """
+        account_data = item[1]
+        if account_data is None:
+            return
+        keys = self.account_sessions.get(account_data["id"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.account_sessions[account_data["id"]]
+
+    def clear(self):
+        self.entries.clear()
+        self.account_sessions.clear()
+
+    def stats(self):
+        return self.entries.stats()
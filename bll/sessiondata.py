@@ -0,0 +1,80 @@
+"""
+ This module contains the representation of data stored in user sessions, and its compact binary serialization.
+
+ Session data is serialized as compact JSON, compressed with zlib when large enough: the first byte of the
+ serialized value describes its format. Values must be JSON serializable.
+"""
+import json
+import zlib
+from collections.abc import MutableMapping
+
+
+PLAIN = b"j"
+COMPRESSED = b"z"
+COMPRESSION_THRESHOLD = 256
+
+
+def serialize(data):
+    """
+    Returns the binary representation of the given session data.
+
+    :param data: dictionary of session data.
+    :return: bytes
+    """
+    value = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(value) >= COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(value)
+        if len(compressed) < len(value):
+            return COMPRESSED + compressed
+    return PLAIN + value
+
+
+def deserialize(value):
+    """
+    Returns session data from its binary representation.
+
+    :param value: bytes, as returned by serialize.
+    :return: dict
+    """
+    if not value:
+        return {}
+    value = bytes(value)
+    header, body = value[:1], value[1:]
+    if header == COMPRESSED:
+        body = zlib.decompress(body)
+    elif header != PLAIN:
+        raise ValueError("Invalid session data format.")
+    return json.loads(body.decode("utf-8"))
+
+
+class SessionData(MutableMapping):
+    """
+    Dictionary of session data that keeps track of its modifications, so it is saved only if modified.
+    Changes to nested objects are not tracked: in that case, call mark_modified.
+    """
+    def __init__(self, data=None):
+        self._data = data if data is not None else {}
+        self.modified = False
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def mark_modified(self):
+        self.modified = True
+
+    def to_dict(self):
+        return dict(self._data)
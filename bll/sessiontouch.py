@@ -0,0 +1,41 @@
+"""
+ This module contains the buffer of session activity used to implement sliding expiration: new expiration times are
+ recorded in memory and written periodically with a single bulk update, instead of an update per request.
+"""
+
+
+class SessionTouchBuffer:
+    """
+    Collects the new expiration times of sessions, by session guid.
+    """
+    def __init__(self):
+        self.pending = {}
+        self.flushed = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def touch(self, session_guid, expiration):
+        """
+        Records a new expiration time for the session with the given guid.
+        """
+        key = str(session_guid)
+        current = self.pending.get(key)
+        if current is None or current < expiration:
+            self.pending[key] = expiration
+
+    def drain(self):
+        """
+        Returns the recorded expiration times, emptying the buffer.
+        """
+        pending, self.pending = self.pending, {}
+        self.flushed += len(pending)
+        return pending
+
+    def restore(self, expirations):
+        """
+        Records again expiration times that could not be written.
+        """
+        self.flushed -= len(expirations)
+        for key, expiration in expirations.items():
+            self.touch(key, expiration)
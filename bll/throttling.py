@@ -0,0 +1,74 @@
+"""
+ This module contains the in-memory rate limiter used to throttle failed login attempts.
+
+ The limiter is local to each worker process, and it is consulted before any database query or password hashing;
+ failed login attempts are still stored in the persistence layer, which works as a durable log.
+"""
+import time
+from collections import deque
+
+
+class SlidingWindowLimiter:
+    """
+    Counts events by key in a sliding time window.
+    Keys are distributed in shards: each recorded event prunes the expired keys of one shard, so the memory used by
+    the limiter stays bounded by the number of keys active in the window, without long pauses.
+    """
+    def __init__(self, limit, window, shards=16, timer=time.monotonic):
+        if limit < 1:
+            raise ValueError("The limit of a SlidingWindowLimiter must be a positive integer.")
+        self.limit = limit
+        self.window = window
+        self.timer = timer
+        self.shards = [{} for _ in range(shards)]
+        self._next_shard = 0
+
+    def _get_shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def count(self, key):
+        """
+        Returns the number of events recorded for the given key in the current window.
+        """
+        events = self._get_shard(key).get(key)
+        if not events:
+            return 0
+        start = self.timer() - self.window
+        while events and events[0] <= start:
+            events.popleft()
+        return len(events)
+
+    def is_limited(self, key):
+        """
+        Returns a value indicating whether the given key reached the limit of events in the current window.
+        """
+        return self.count(key) >= self.limit
+
+    def hit(self, key):
+        """
+        Records an event for the given key.
+        """
+        shard = self._get_shard(key)
+        events = shard.get(key)
+        if events is None:
+            # only the latest events are necessary to know whether the limit is reached
+            events = shard[key] = deque(maxlen=self.limit)
+        events.append(self.timer())
+        self._prune_next_shard()
+
+    def reset(self, key):
+        """
+        Forgets the events recorded for the given key.
+        """
+        self._get_shard(key).pop(key, None)
+
+    def _prune_next_shard(self):
+        shard = self.shards[self._next_shard]
+        self._next_shard = (self._next_shard + 1) % len(self.shards)
+        start = self.timer() - self.window
+        expired = [key for key, events in shard.items() if not events or events[-1] <= start]
+        for key in expired:
+            del shard[key]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
@@ -0,0 +1,31 @@
+"""
+* Copyright 2016, Roberto Prevato roberto.prevato@gmail.com
+* https://github.com/RobertoPrevato/aiohttp-three-template
+*
+* Licensed under the MIT license:
+* http://www.opensource.org/licenses/MIT
+*
+* Utility script to compile the templates of the application into the Jinja2 bytecode cache, e.g. during deployment;
+* so worker processes do not compile templates when they start.
+* The bytecode cache is used when the application is not configured for development.
+"""
+import logging
+import jinja2
+import aiohttp_jinja2
+from aiohttp import web
+from app import configuration
+from app.helpers.global_helpers import setup_global_helpers
+from app.helpers.rendering import setup_translations, get_template_options, load_templates
+
+logging.basicConfig(level=logging.INFO)
+
+if configuration.development:
+    print("The application is configured for development: the bytecode cache is not used.")
+else:
+    app = web.Application()
+    setattr(app, "config", configuration)
+    # the environments are configured like in app.server.init
+    aiohttp_jinja2.setup(app, loader=jinja2.PackageLoader("app", "templates"), **get_template_options())
+    setup_global_helpers(app)
+    setup_translations(app)
+    load_templates(app)
@@ -0,0 +1,17 @@
+"""
+* Copyright 2016, Roberto Prevato roberto.prevato@gmail.com
+* https://github.com/RobertoPrevato/aiohttp-three-template
+*
+* Licensed under the MIT license:
+* http://www.opensource.org/licenses/MIT
+*
+* Utility script to compile the translations of the application into binary catalogs, e.g. during deployment.
+"""
+import logging
+from app.translations.catalogs import compile_catalogs
+
+logging.basicConfig(level=logging.INFO)
+
+missing = compile_catalogs()
+if missing:
+    print("Some cultures miss translations: see the warnings above.")
@@ -0,0 +1,121 @@
+"""This module contains a bounded, in-process cache with least-recently-used eviction and time-to-live support."""
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A bounded dictionary-like cache: when the maximum size is reached, the least recently used item is evicted.
+    Items can optionally expire after a time-to-live (seconds), either global for the cache or specific for each item.
+
+    The cache keeps hit and miss counters, to measure its effectiveness. An optional on_evict callback is called with
+    the key and the value of items removed by the cache itself, because of eviction or expiration.
+    """
+    def __init__(self, maxsize=1000, ttl=None, timer=time.monotonic, on_evict=None):
+        if maxsize is None or maxsize < 1:
+            raise ValueError("The maxsize of a LRUCache must be a positive integer.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return False
+        expiration = item[1]
+        return expiration is None or expiration > self.timer()
+
+    def get(self, key, default=None):
+        """
+        Returns the value associated with the given key, or the default value if the key is missing or expired.
+
+        :param key: item key.
+        :param default: value returned in case of a cache miss.
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        value, expiration = item
+        if expiration is not None and expiration <= self.timer():
+            del self._data[key]
+            self.misses += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        """
+        Returns the value associated with the given key, without affecting the eviction order nor the counters.
+
+        :param key: item key.
+        :param default: value returned if the key is missing or expired.
+        """
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expiration = item
+        if expiration is not None and expiration <= self.timer():
+            return default
+        return value
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value in cache, evicting the least recently used item if the cache is full.
+
+        :param key: item key.
+        :param value: item value.
+        :param ttl: optional time-to-live in seconds, overriding the cache default.
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expiration = self.timer() + ttl if ttl is not None else None
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = (value, expiration)
+        while len(data) > self.maxsize:
+            evicted_key, evicted_item = data.popitem(last=False)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_item[0])
+
+    def delete(self, key):
+        """
+        Removes the item with the given key, if present.
+
+        :param key: item key.
+        :return: True if an item was removed, False otherwise.
+        """
+        return self._data.pop(key, None) is not None
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        """
+        Returns a dictionary describing the usage of this cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
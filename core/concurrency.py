@@ -0,0 +1,46 @@
+"""This module contains utilities for the coordination of coroutines."""
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent executions of the same operation: while an operation with a certain key is in flight,
+    other callers requesting the same key await its result, instead of starting a new execution.
+    """
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, factory):
+        """
+        Returns the result of the operation with the given key, starting it only if not already in flight.
+
+        :param key: hashable key identifying the operation.
+        :param factory: function returning the awaitable to execute.
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory(), loop=self.loop)
+            self.calls[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda t: self._complete(key, t))
+        else:
+            self.coalesced += 1
+        # shield the shared execution, so a cancelled caller does not cancel it for the others
+        return await asyncio.shield(task)
+
+    def _complete(self, key, task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            # mark the exception as retrieved, even if all the callers were cancelled
+            task.exception()
+
+    def stats(self):
+        return {
+            "in_flight": len(self.calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,56 @@
+#
+# HMAC-SHA256 signatures for values that must be stored on the client side without being altered,
+# like self-contained cookies.
+#
+import base64
+import hashlib
+import hmac
+
+SEPARATOR = "."
+
+
+def derive_key(secret, purpose):
+    """
+    Derives a key for a specific purpose from a secret, so the same secret can be used for different signatures.
+    """
+    if isinstance(secret, str):
+        secret = secret.encode("utf-8")
+    return hmac.new(secret, purpose.encode("utf-8"), hashlib.sha256).digest()
+
+
+def urlsafe_encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def urlsafe_decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class Signer:
+    """
+    Signs string values with HMAC-SHA256; the key is derived once, when the signer is created.
+    """
+    def __init__(self, secret, purpose="signer"):
+        self.key = derive_key(secret, purpose)
+
+    def get_signature(self, value):
+        return urlsafe_encode(hmac.new(self.key, value.encode("utf-8"), hashlib.sha256).digest())
+
+    def sign(self, value):
+        """
+        Returns the given value, followed by its signature.
+        """
+        return value + SEPARATOR + self.get_signature(value)
+
+    def unsign(self, signed_value):
+        """
+        Returns the original value if the signature is valid, None otherwise.
+        """
+        if isinstance(signed_value, bytes):
+            signed_value = signed_value.decode("utf-8")
+        value, separator, signature = signed_value.rpartition(SEPARATOR)
+        if not separator:
+            return None
+        if not hmac.compare_digest(signature.encode("utf-8"), self.get_signature(value).encode("ascii")):
+            return None
+        return value
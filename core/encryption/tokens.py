@@ -0,0 +1,52 @@
+#
+# Versioned, HMAC-SHA256 authenticated tokens, for values stored in cookies.
+# Tokens have the format: version.kind.value.signature; the signature covers everything before it.
+# Verification costs a single HMAC computation, and tokens that are not well formed are rejected without computing it.
+#
+from core.encryption.signing import Signer, SEPARATOR
+
+VERSION = "v1"
+MAX_TOKEN_LENGTH = 512
+
+
+class TokenSerializer:
+    """
+    Creates and verifies authenticated tokens; the key is derived once from the secret, when the serializer is created.
+    Values are not encrypted: tokens must not contain secret information.
+    """
+    prefix = VERSION + SEPARATOR
+
+    def __init__(self, secret, purpose="token"):
+        self.signer = Signer(secret, purpose)
+
+    @classmethod
+    def is_token(cls, text):
+        """
+        Returns a value indicating whether the given text looks like a token of the current version.
+        """
+        return text.startswith(cls.prefix)
+
+    def dumps(self, kind, value):
+        """
+        Returns a token for the given kind of value and value.
+
+        :param kind: kind of the value, without separators (e.g. "s" for session).
+        :param value: value, which may contain separators.
+        """
+        if SEPARATOR in kind:
+            raise ValueError("The kind of a token cannot contain `{}`.".format(SEPARATOR))
+        return self.signer.sign(self.prefix + kind + SEPARATOR + value)
+
+    def loads(self, token):
+        """
+        Returns the kind and the value of a valid token; None, None if the token is not valid.
+        """
+        if not token or len(token) > MAX_TOKEN_LENGTH or not self.is_token(token):
+            return None, None
+        content = self.signer.unsign(token)
+        if content is None:
+            return None, None
+        kind, separator, value = content[len(self.prefix):].partition(SEPARATOR)
+        if not separator:
+            return None, None
+        return kind, value
@@ -0,0 +1,103 @@
+"""
+ This module contains binary translation catalogs, in the GNU gettext MO format.
+
+ Keys are sorted, so a translation is found with a binary search over the memory-mapped file, without parsing it:
+ catalogs are opened on first use, and the pages of a catalog are shared by all the processes reading it.
+"""
+import mmap
+import os
+import struct
+
+MAGIC = 0x950412de
+HEADER = struct.Struct("<7I")
+ENTRY = struct.Struct("<2I")
+# metadata of the catalog, stored as translation of the empty key (as gettext tools do)
+METADATA = "Content-Type: text/plain; charset=UTF-8\n"
+
+
+def write_catalog(path, table):
+    """
+    Writes a catalog with the translations of the given table. The file is replaced atomically, so processes that
+    already mapped the previous version keep reading it.
+
+    :param path: path of the catalog file.
+    :param table: dictionary of translations by key.
+    """
+    items = sorted((key.encode("utf-8"), value.encode("utf-8")) for key, value in table.items() if key)
+    items.insert(0, (b"", METADATA.encode("utf-8")))
+    count = len(items)
+    originals_offset = HEADER.size
+    translations_offset = originals_offset + count * ENTRY.size
+    data_offset = translations_offset + count * ENTRY.size
+
+    originals, translations, data = [], [], []
+    offset = data_offset
+    for key, _ in items:
+        originals.append(ENTRY.pack(len(key), offset))
+        data.append(key + b"\0")
+        offset += len(key) + 1
+    for _, value in items:
+        translations.append(ENTRY.pack(len(value), offset))
+        data.append(value + b"\0")
+        offset += len(value) + 1
+
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, count, originals_offset, translations_offset, 0, data_offset))
+        f.write(b"".join(originals))
+        f.write(b"".join(translations))
+        f.write(b"".join(data))
+    os.replace(temp_path, path)
+
+
+class Catalog:
+    """
+    A read-only, memory-mapped translation catalog; the file is opened on first lookup.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._count = 0
+        self._originals = 0
+        self._translations = 0
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, count, originals, translations, _, _ = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            data.close()
+            raise ValueError("Invalid translation catalog: `{}`.".format(self.path))
+        self._count = count
+        self._originals = originals
+        self._translations = translations
+        self._data = data
+        return data
+
+    def get(self, key, default=None):
+        """
+        Returns the translation of the given key; or the default value if the key is not in the catalog.
+        """
+        data = self._data if self._data is not None else self._load()
+        target = key.encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            length, offset = ENTRY.unpack_from(data, self._originals + middle * ENTRY.size)
+            candidate = data[offset:offset + length]
+            if candidate < target:
+                low = middle + 1
+            elif candidate > target:
+                high = middle
+            else:
+                length, offset = ENTRY.unpack_from(data, self._translations + middle * ENTRY.size)
+                return data[offset:offset + length].decode("utf-8")
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._data = None
@@ -0,0 +1,42 @@
+"""This module contains functions to compile nested translation dictionaries into flat lookup tables."""
+
+MISSING_TRANSLATION = "Missing translation for `{}`"
+
+
+def flatten(values, prefix=""):
+    """
+    Returns a flat dictionary of translations by dotted key, from a dictionary of nested translations.
+    For example: {"site": {"name": "..."}} -> {"site.name": "..."}
+
+    :param values: dictionary of nested translations.
+    :param prefix: prefix of the keys, for nested dictionaries.
+    """
+    table = {}
+    for key, value in values.items():
+        full_key = prefix + key
+        if isinstance(value, dict):
+            table.update(flatten(value, full_key + "."))
+        else:
+            table[full_key] = value
+    return table
+
+
+def build_tables(regional):
+    """
+    Builds flat translation tables, by culture; keys defined by some cultures but missing in others are detected here,
+    to be reported when translations are compiled. Missing keys are left out of the tables, so lookups can fall back
+    to a default value.
+
+    :param regional: dictionary of nested translations, by culture.
+    :return: tables of translations by culture, dictionary of sorted missing keys by culture
+    """
+    tables = {culture: flatten(values) for culture, values in regional.items()}
+    keys = set()
+    for table in tables.values():
+        keys.update(table)
+    missing = {}
+    for culture, table in tables.items():
+        missing_keys = keys.difference(table)
+        if missing_keys:
+            missing[culture] = sorted(missing_keys)
+    return tables, missing
@@ -0,0 +1,131 @@
+"""This module contains a scheduler for periodic jobs, executed inside the application event loop."""
+import asyncio
+import logging
+import random
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    A periodic job, with its execution metrics.
+    """
+    def __init__(self, name, func, interval, jitter=0.1, exclusive=False):
+        if interval <= 0:
+            raise ValueError("The interval of a job must be greater than zero.")
+        if not 0 <= jitter < 1:
+            raise ValueError("The jitter of a job must be a fraction of its interval, between 0 and 1.")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.exclusive = exclusive
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+
+    def get_delay(self):
+        """
+        Returns the delay before the next execution: the interval, randomly spread by the jitter, so that the same job
+        scheduled by many processes does not run in the same moment.
+        """
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error
+        }
+
+
+class Scheduler:
+    """
+    Executes coroutine functions periodically.
+
+    Exclusive jobs are executed through the exclusive_runner function, which receives the job name, the coroutine
+    function and the minimum interval between two executions (the interval reduced by the jitter); it returns False
+    without executing the function if another process is running the same job, or ran it more recently.
+    This allows to have a single runner of a job across many workers, once per interval.
+    """
+    def __init__(self, loop=None, exclusive_runner=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.exclusive_runner = exclusive_runner
+        self.jobs = {}
+        self.tasks = []
+
+    def add_job(self, name, func, interval, jitter=0.1, exclusive=False):
+        """
+        Adds a periodic job.
+
+        :param name: unique name of the job.
+        :param func: coroutine function to execute.
+        :param interval: interval between executions, in seconds.
+        :param jitter: random variation of the interval, as a fraction of it.
+        :param exclusive: whether the job must not run concurrently in more processes.
+        """
+        if name in self.jobs:
+            raise ValueError("A job with name `{}` is already scheduled.".format(name))
+        if exclusive and self.exclusive_runner is None:
+            raise ValueError("An exclusive_runner is required to schedule exclusive jobs.")
+        job = Job(name, func, interval, jitter, exclusive)
+        self.jobs[name] = job
+        if self.tasks:
+            self.tasks.append(asyncio.ensure_future(self._loop_job(job), loop=self.loop))
+        return job
+
+    def start(self):
+        if self.tasks:
+            return
+        for job in self.jobs.values():
+            self.tasks.append(asyncio.ensure_future(self._loop_job(job), loop=self.loop))
+
+    async def stop(self):
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def _loop_job(self, job):
+        while True:
+            await asyncio.sleep(job.get_delay())
+            await self.run_job(job)
+
+    async def run_job(self, job):
+        """
+        Executes a job once, updating its metrics.
+        """
+        start = time.monotonic()
+        job.last_run = time.time()
+        try:
+            if job.exclusive:
+                executed = await self.exclusive_runner(job.name, job.func, job.interval * (1 - job.jitter))
+                if not executed:
+                    job.skipped += 1
+                    return
+            else:
+                await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            job.failures += 1
+            job.last_error = str(ex)
+            logger.exception("The job `%s` failed", job.name)
+            return
+        finally:
+            job.last_duration = time.monotonic() - start
+        job.runs += 1
+        job.last_error = None
+
+    def stats(self):
+        return {name: job.stats() for name, job in self.jobs.items()}
@@ -1,21 +1,45 @@
 from aiopg.sa import create_engine
+from dal.routing import require_primary, is_primary_required
 
 __all__ = ["bootstrap"]
 
 dbclient = None
+replicas = []
 
-def get_client():
+def get_client(readonly=False):
     """
     Returns the database client initialized for the application.
+
+    :param readonly: whether the client is used only for reading: in this case, the replica with the least outstanding
+                     requests is returned, unless the current task wrote to the primary database before.
     """
     global dbclient
+    if readonly:
+        if replicas and not is_primary_required():
+            return min(replicas, key=get_outstanding_requests)
+    else:
+        # the following reads of the current task must observe its writes
+        require_primary()
+    return dbclient
+
+
+def get_primary_client():
+    """
+    Returns the database client of the primary database, without binding the current task to it.
+    """
     return dbclient
 
 
+def get_outstanding_requests(client):
+    return client.in_use + len(client.waiters)
+
+
 async def close_pg():
     global dbclient
-    dbclient.close()
-    await dbclient.wait_closed()
+    for client in [dbclient] + replicas:
+        client.close()
+    for client in [dbclient] + replicas:
+        await client.wait_closed()
 
 
 async def bootstrap(configuration, loop):
@@ -23,13 +47,30 @@ async def bootstrap(configuration, loop):
     Creates the database client for the application.
     """
     global dbclient
-    dbclient = await init_postgres(configuration["postgres"], loop)
+    from dal.batching import configure_batchers
+    conf = configuration["postgres"]
+    configure_batchers(conf.get("write_behind"))
+    dbclient = await init_postgres(conf, loop)
+    del replicas[:]
+    for replica_conf in conf.get("replicas") or []:
+        replicas.append(await init_postgres(get_replica_conf(conf, replica_conf), loop))
+
+
+def get_replica_conf(conf, replica_conf):
+    """
+    Returns the settings of a replica database: replicas inherit the settings of the primary, except the ones they
+    define (e.g. host and port).
+    """
+    keys = ("database", "user", "password", "host", "port", "minsize", "maxsize", "pool")
+    return {key: replica_conf[key] if key in replica_conf else conf.get(key) for key in keys}
 
 
 async def init_postgres(conf, loop):
     """
-    Initializes a database client for the application.
+    Initializes a database client for the application: an aiopg.sa engine, wrapped by an instrumented engine that
+    limits the connections in use and fails fast when they cannot be acquired in time.
     """
+    from dal.pool import InstrumentedEngine
     engine = await create_engine(
         database=conf["database"],
         user=conf["user"],
@@ -39,4 +80,7 @@ async def init_postgres(conf, loop):
         minsize=conf["minsize"],
         maxsize=conf["maxsize"],
         loop=loop)
-    return engine
\ No newline at end of file
+    client = InstrumentedEngine(engine, conf["minsize"], conf["maxsize"], conf.get("pool"), loop=loop)
+    if client.prewarm_enabled:
+        await client.prewarm()
+    return client
\ No newline at end of file
@@ -0,0 +1,231 @@
+"""
+ This module contains a write-behind batcher, that collects INSERT commands for a table during a short time window
+ and executes them as a single multi-row INSERT ... RETURNING; reducing the number of pooled connections
+ acquisitions and network round trips under load.
+
+ PostgreSQL does not guarantee that RETURNING rows come back in the order of the VALUES list: generated ids are
+ matched to callers by key columns, returned together with the id. When a batch fails (e.g. for a constraint
+ violation), its rows are inserted one at a time, so a bad row fails only its own caller.
+"""
+import asyncio
+import logging
+import sqlalchemy as sa
+from dal import get_client
+from dal.exceptions import PoolTimeout
+from dal.routing import require_primary
+from dal.statements import CompiledStatement
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBatcher:
+    """
+    Collects rows to insert into a table and flushes them when max_rows rows are pending, or after max_delay seconds
+    from the first pending row; whichever comes first. Each caller receives the id generated for its row.
+
+    Rows are matched to generated ids by the values of key_columns (by default, all inserted columns): rows with the
+    same key have the same values, so they can receive each other's ids.
+    """
+    def __init__(self, table, max_rows=100, max_delay=0.005, key_columns=None, loop=None):
+        self.table = table
+        self.key_columns = tuple(key_columns) if key_columns else None
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.loop = loop or asyncio.get_event_loop()
+        self.pending = []
+        self.flushes = set()
+        self.flushed_rows = 0
+        self.flushed_batches = 0
+        self.statements = {}
+        self._handle = None
+
+    @property
+    def enabled(self):
+        return self.max_rows > 1
+
+    async def insert(self, data):
+        """
+        Inserts a row in the table, returning its generated id.
+
+        :param data: row data, in dictionary; rows inserted in the same table must have the same keys.
+        :return: id of the inserted row
+        """
+        # the row is inserted by another task: the caller must read it from the primary database
+        require_primary()
+        if not self.enabled:
+            return (await self._execute([data]))[0]
+
+        future = asyncio.Future(loop=self.loop)
+        self.pending.append((data, future))
+        if len(self.pending) >= self.max_rows:
+            self._start_flush()
+        elif self._handle is None:
+            self._handle = self.loop.call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        task = asyncio.ensure_future(self.flush(), loop=self.loop)
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def flush(self):
+        """
+        Inserts all the pending rows, resolving the awaitables of their callers.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self.pending = self.pending[:self.max_rows], self.pending[self.max_rows:]
+        if not batch:
+            return
+        if self.pending:
+            # rows exceeding the batch size are flushed concurrently, by another batch
+            self._start_flush()
+        try:
+            ids = await self._execute([data for data, _ in batch])
+        except PoolTimeout as ex:
+            # the database is not available: retrying rows one at a time would only wait longer
+            self._fail(batch, ex)
+            return
+        except Exception as ex:
+            if len(batch) == 1:
+                self._fail(batch, ex)
+                return
+            logger.warning("Failed to insert %d rows in %s, inserting them one at a time: %s",
+                           len(batch), self.table.name, ex)
+            await self._insert_each(batch)
+            return
+        self.flushed_rows += len(batch)
+        self.flushed_batches += 1
+        for (_, future), row_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(row_id)
+
+    async def _insert_each(self, batch):
+        for data, future in batch:
+            try:
+                row_id = (await self._execute([data]))[0]
+            except Exception as ex:
+                self._fail([(data, future)], ex)
+                continue
+            self.flushed_rows += 1
+            self.flushed_batches += 1
+            if not future.done():
+                future.set_result(row_id)
+
+    def _fail(self, batch, ex):
+        logger.error("Failed to insert %d rows in %s: %s", len(batch), self.table.name, ex)
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(ex)
+
+    def get_key_columns(self, columns):
+        return self.key_columns or columns
+
+    @staticmethod
+    def get_row_key(values):
+        # values are compared as text, since the driver can return them with a different type (e.g. uuid)
+        return tuple(str(value) for value in values)
+
+    def get_statement(self, columns, count):
+        """
+        Returns the compiled INSERT statement for the given columns and number of rows; statements are compiled once
+        for each batch size, with bound parameters named column_index. Statements return the generated id and the key
+        columns of each row.
+
+        :param columns: tuple of names of the inserted columns.
+        :param count: number of inserted rows.
+        """
+        key = (columns, count)
+        statement = self.statements.get(key)
+        if statement is None:
+            table = self.table
+            rows = [{column: sa.bindparam("{}_{}".format(column, i)) for column in columns} for i in range(count)]
+            returned = [table.c.id] + [table.c[column] for column in self.get_key_columns(columns)]
+            statement = CompiledStatement(table.insert().values(rows).returning(*returned))
+            self.statements[key] = statement
+        return statement
+
+    async def _execute(self, rows):
+        columns = tuple(sorted(rows[0]))
+        statement = self.get_statement(columns, len(rows))
+        values = {"{}_{}".format(column, i): row[column] for i, row in enumerate(rows) for column in columns}
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            result = await statement.execute(conn, **values)
+            returned = await result.fetchall()
+        return self.match_ids(rows, columns, returned)
+
+    def match_ids(self, rows, columns, returned):
+        """
+        Returns the generated ids of the given rows, in the same order, from the rows returned by an INSERT statement
+        (id, followed by the key columns).
+        """
+        key_columns = self.get_key_columns(columns)
+        ids = {}
+        for row in returned:
+            ids.setdefault(self.get_row_key(row[1:]), []).append(row[0])
+        matched = []
+        for data in rows:
+            candidates = ids.get(self.get_row_key(data[column] for column in key_columns))
+            if not candidates:
+                raise RuntimeError("The generated id of a row inserted in {} was not returned.".format(self.table.name))
+            matched.append(candidates.pop())
+        return matched
+
+    async def close(self):
+        """
+        Flushes the pending rows and waits for the completion of flushes in progress.
+        """
+        while self.pending or self.flushes:
+            await self.flush()
+            if self.flushes:
+                await asyncio.wait(list(self.flushes))
+
+    def stats(self):
+        return {
+            "pending": len(self.pending),
+            "flushed_rows": self.flushed_rows,
+            "flushed_batches": self.flushed_batches
+        }
+
+
+batchers = {}
+batching_options = {}
+
+
+def configure_batchers(options):
+    """
+    Configures the write-behind batchers created by get_batcher.
+
+    :param options: dictionary with optional max_rows and max_delay (seconds) keys.
+    """
+    batching_options.clear()
+    if options:
+        batching_options.update(options)
+
+
+def get_batcher(table, key_columns=None):
+    """
+    Returns the write-behind batcher for the given table.
+
+    :param table: table of inserted rows.
+    :param key_columns: columns identifying inserted rows; by default, all inserted columns.
+    """
+    batcher = batchers.get(table.name)
+    if batcher is None:
+        batcher = WriteBehindBatcher(table,
+                                     max_rows=batching_options.get("max_rows", 100),
+                                     max_delay=batching_options.get("max_delay", 0.005),
+                                     key_columns=key_columns)
+        batchers[table.name] = batcher
+    return batcher
+
+
+async def flush_batchers():
+    """
+    Flushes all the pending rows of write-behind batchers; to be used when the application shuts down.
+    """
+    for batcher in list(batchers.values()):
+        await batcher.close()
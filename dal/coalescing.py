@@ -0,0 +1,73 @@
+"""
+ This module contains the decorator used to mark idempotent methods of stores: concurrent calls with the same
+ arguments share a single in-flight database query. For example, a page loading several resources with AJAX requests
+ causes a single session lookup instead of one per request.
+
+ Results of idempotent methods are shared by all the callers: each caller receives a copy of the dictionaries, lists
+ and tuples of the result, so it can update them in place. Stores using the IdempotentMethods metaclass keep methods
+ idempotent when subclasses override them.
+"""
+import asyncio
+from functools import wraps
+from core.concurrency import SingleFlight
+from dal.routing import is_primary_required, on_primary
+
+
+def get_single_flight(store):
+    flight = store.__dict__.get("_single_flight")
+    if flight is None:
+        flight = store._single_flight = SingleFlight()
+    return flight
+
+
+def copy_result(value):
+    """
+    Returns a copy of the containers of a shared result: dictionaries, lists and tuples, recursively.
+    """
+    if isinstance(value, dict):
+        return {key: copy_result(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_result(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(copy_result(item) for item in value)
+    return value
+
+
+def idempotent(f):
+    """
+    Marks a coroutine method as idempotent, coalescing concurrent calls with the same arguments.
+    """
+    @wraps(f)
+    async def wrapped(self, *args, **kwargs):
+        primary = is_primary_required()
+        # calls bound to the primary database are not coalesced with calls that may read from replicas;
+        # the key includes the function, so an override calling the base method does not wait for itself
+        key = (f, primary, args, frozenset(kwargs.items())) if kwargs else (f, primary, args)
+        try:
+            hash(key)
+        except TypeError:
+            # unhashable arguments cannot be coalesced
+            return await f(self, *args, **kwargs)
+        if primary:
+            # the shared call is executed by another task, which must read from the primary database too
+            result = await get_single_flight(self).do(key, lambda: on_primary(f(self, *args, **kwargs)))
+        else:
+            result = await get_single_flight(self).do(key, lambda: f(self, *args, **kwargs))
+        return copy_result(result)
+
+    wrapped.idempotent = True
+    return wrapped
+
+
+class IdempotentMethods(type):
+    """
+    Metaclass keeping methods idempotent in subclasses: coroutine methods overriding an idempotent method are
+    decorated with idempotent too.
+    """
+    def __new__(mcs, name, bases, namespace):
+        for attribute, value in list(namespace.items()):
+            if not asyncio.iscoroutinefunction(value) or getattr(value, "idempotent", False):
+                continue
+            if any(getattr(getattr(base, attribute, None), "idempotent", False) for base in bases):
+                namespace[attribute] = idempotent(value)
+        return super().__new__(mcs, name, bases, namespace)
@@ -1,2 +1,10 @@
 class RecordNotFound(Exception):
-    """Requested record in database was not found"""
\ No newline at end of file
+    """Requested record in database was not found"""
+
+
+class PoolTimeout(Exception):
+    """A database connection could not be acquired in time"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,49 @@
+"""
+ This module contains functions to coordinate the processes of the application using PostgreSQL advisory locks.
+
+ The last run of exclusive jobs is stored in the scheduled_job table: a job scheduled by many processes runs once per
+ interval, by whichever process acquires the lock first.
+"""
+import datetime
+import zlib
+from dal import get_client
+
+
+def get_lock_key(name):
+    """
+    Returns the numeric key of the advisory lock with the given name; the key is stable across processes.
+    """
+    return zlib.crc32(name.encode("utf-8"))
+
+
+async def run_exclusively(name, func, min_interval=None):
+    """
+    Executes a coroutine function, only if no other process is executing a function with the same name, and if no
+    process executed it in the last min_interval seconds.
+    The advisory lock is held by a pooled connection for the duration of the execution.
+
+    :param name: name of the lock.
+    :param func: coroutine function to execute.
+    :param min_interval: minimum number of seconds between the starts of two executions, in any process.
+    :return: True if the function was executed, False otherwise.
+    """
+    key = get_lock_key(name)
+    dbclient = get_client()
+    async with dbclient.acquire() as conn:
+        acquired = await conn.scalar("SELECT pg_try_advisory_lock(%(key)s)", key=key)
+        if not acquired:
+            return False
+        try:
+            # the time of the database is used, since the clocks of application servers may differ
+            now, last_run = await (await conn.execute(
+                "SELECT clock_timestamp()::timestamp, (SELECT last_run FROM scheduled_job WHERE name = %(name)s)",
+                name=name)).first()
+            if min_interval and last_run is not None and now - last_run < datetime.timedelta(seconds=min_interval):
+                return False
+            await func()
+            await conn.execute("INSERT INTO scheduled_job (name, last_run) VALUES (%(name)s, %(last_run)s) "
+                               "ON CONFLICT (name) DO UPDATE SET last_run = EXCLUDED.last_run",
+                               name=name, last_run=now)
+        finally:
+            await conn.scalar("SELECT pg_advisory_unlock(%(key)s)", key=key)
+    return True
@@ -5,35 +5,186 @@
 """
 import uuid
 from datetime import datetime
-from dal import get_client
+import sqlalchemy as sa
+from dal import get_client, get_primary_client
+from dal.batching import get_batcher
+from dal.coalescing import idempotent, IdempotentMethods
 
 
-class MembershipStore:
+class MembershipStore(metaclass=IdempotentMethods):
     """
     Provides methods to handle membership related data in the persistence layer.
+
+    Concrete stores must be decorated with dal.statements.prepare_statements, to compile the statements executed at
+    every request.
     """
     session = None  # session entity
     account = None  # account entity
+    login_attempt = None  # login attempt entity
+    statements = None  # compiled statements, by name
 
-    async def get_account(self, account_id):
-        account = self.account
-        dbclient = get_client()
+    @classmethod
+    def get_session_columns(cls):
+        """
+        Returns the columns of the session table read by session lookups: session data is read only on demand.
+        """
+        return [column for column in cls.session.c if column.name != "data"]
+
+    @classmethod
+    def get_statements(cls):
+        """
+        Returns the statements executed at every request, compiled once per store type by prepare_statements.
+        Bound parameters are named after the arguments of the methods executing the statements.
+        """
+        session, account = cls.session, cls.account
+        session_columns = cls.get_session_columns()
+        now = sa.func.timezone("utc", sa.func.now())
+        return {
+            "get_account": account.select()
+            .where(account.c.id == sa.bindparam("account_id")),
+
+            "get_account_by_key": account.select()
+            .where(sa.or_(account.c.email == sa.bindparam("userkey"),
+                          account.c.username == sa.bindparam("userkey"))),
+
+            "get_session": sa.select(session_columns)
+            .where(session.c.id == sa.bindparam("session_id")),
+
+            "get_session_by_guid": sa.select(session_columns)
+            .where(session.c.guid == sa.bindparam("session_guid")),
+
+            "get_session_and_account": sa.select(
+                session_columns +
+                [column.label("account_" + column.name) for column in account.c] +
+                [(session.c.expiration_time < now).label("expired")])
+            .select_from(session.outerjoin(account, session.c.user_id == account.c.id))
+            .where(session.c.guid == sa.bindparam("session_guid"))
+        }
+
+    async def read_first(self, name, recheck_missing=False, **values):
+        """
+        Executes a compiled read-only statement, routed to a replica database if available, returning its first row.
+
+        :param name: name of the compiled statement.
+        :param recheck_missing: whether to read again from the primary database when no row is found on a replica,
+                                for rows that may have been created so recently that replicas did not receive them.
+        :param values: values of the bound parameters.
+        """
+        statement = self.statements[name]
+        dbclient = get_client(readonly=True)
         async with dbclient.acquire() as conn:
-            result = await conn.execute(
-                account.select()
-                .where(account.c.id == account_id))
-            return await result.first()
+            row = await (await statement.execute(conn, **values)).first()
+        primary = get_primary_client()
+        if row is None and recheck_missing and dbclient is not primary:
+            async with primary.acquire() as conn:
+                row = await (await statement.execute(conn, **values)).first()
+        return row
+
+    @idempotent
+    async def get_account(self, account_id):
+        return await self.read_first("get_account", account_id=account_id)
+
+    @idempotent
+    async def get_account_by_key(self, userkey):
+        """
+        Gets the account with the given key (email address or username).
+
+        :param userkey: email address or username.
+        """
+        return await self.read_first("get_account_by_key", userkey=userkey)
 
     async def get_accounts(self, options):
         raise NotImplementedError
 
     async def create_account(self, userkey, hashedpassword, salt, data, roles=None):
-        raise NotImplementedError
+        """
+        Creates a new account.
+
+        :param userkey: email address of the user.
+        :param hashedpassword: hashed password.
+        :param salt: salt used to hash the password.
+        :param data: additional account data (e.g. username, confirmation_key).
+        :param roles: roles of the account (not stored by this base implementation).
+        :return: account data
+        """
+        account = self.account
+        values = self._get_account_values(data)
+        values.update(
+            email=userkey,
+            username=values.get("username") or userkey,
+            hashed_password=hashedpassword,
+            salt=salt,
+            creation_time=datetime.utcnow()
+        )
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            result = await conn.execute(account.insert().values(**values).returning(account.c.id))
+            values["id"] = (await result.first())[0]
+        return values
 
     async def update_account(self, userkey, data):
-        raise NotImplementedError
+        """
+        Updates the account with the given key (email address or username).
+
+        :param userkey: email address or username.
+        :param data: account data to update.
+        """
+        account = self.account
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            await conn.execute(
+                account.update()
+                .where(sa.or_(account.c.email == userkey, account.c.username == userkey))
+                .values(**self._get_account_values(data)))
+
+    async def update_account_by_id(self, account_id, data):
+        """
+        Updates the account with the given id.
+
+        :param account_id: account id.
+        :param data: account data to update.
+        """
+        account = self.account
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            await conn.execute(
+                account.update()
+                .where(account.c.id == account_id)
+                .values(**self._get_account_values(data)))
+
+    async def change_password(self, account_id, hashedpassword, salt):
+        """
+        Sets the hashed password and the salt of the account with the given id.
+        """
+        await self.update_account_by_id(account_id, {
+            "hashed_password": hashedpassword,
+            "salt": salt
+        })
+
+    async def delete_account_by_id(self, account_id):
+        """
+        Deletes the account with the given id, with its sessions and login attempts.
+
+        :param account_id: account id.
+        :return: the number of deleted accounts
+        """
+        account, session, login_attempt = self.account, self.session, self.login_attempt
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            async with conn.begin():
+                await conn.execute(session.delete().where(session.c.user_id == account_id))
+                await conn.execute(login_attempt.delete().where(login_attempt.c.user_id == account_id))
+                result = await conn.execute(account.delete().where(account.c.id == account_id))
+                return result.rowcount
 
-    async def create_session(self, user_id, expiration, client_ip, client_info):
+    def _get_account_values(self, data):
+        """
+        Returns the items of the given account data that correspond to columns of the account table.
+        """
+        columns = self.account.c
+        return {key: value for key, value in data.items() if key in columns and key != "id"}
+
+    async def create_session(self, user_id, expiration, client_ip, client_info, guid=None):
         """
         Creates a new session.
 
@@ -41,11 +192,12 @@ class MembershipStore:
         :param expiration: expiration time
         :param client_ip: client ip
         :param client_info: information about the client software
+        :param guid: optional guid of the session, if already assigned
         :return:
         """
         session = self.session
         data = dict(
-            guid=uuid.uuid1(),
+            guid=str(guid or uuid.uuid1()),
             user_id=user_id,
             anonymous=not user_id,
             expiration_time=expiration,
@@ -53,61 +205,167 @@ class MembershipStore:
             client_info=client_info,
             creation_time=datetime.utcnow()
         )
-        command = session.insert().values(**data)
-        dbclient = get_client()
-        async with dbclient.acquire() as conn:
-            result = await conn.execute(command)
-            id = await result.fetchone()
-            data.update({
-                "id": id[0]
-            })
-            return data
+        # the insert is batched with other sessions created in the same moment
+        data["id"] = await get_batcher(session, key_columns=("guid",)).insert(data)
+        return data
 
     async def destroy_session(self, sessionkey):
-        raise NotImplementedError
+        """
+        Deletes the session with the given guid.
+
+        :param sessionkey: guid of the session to delete.
+        """
+        session = self.session
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            await conn.execute(
+                session.delete()
+                .where(session.c.guid == str(sessionkey)))
 
     async def save_session_data(self, sessionkey, data):
-        raise NotImplementedError
+        """
+        Stores the serialized data of the session with the given guid.
+
+        :param sessionkey: guid of the session.
+        :param data: serialized session data, in bytes.
+        """
+        session = self.session
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            await conn.execute(
+                session.update()
+                .where(session.c.guid == str(sessionkey))
+                .values(data=data))
 
     async def get_session_data(self, sessionkey):
-        raise NotImplementedError
+        """
+        Gets the serialized data of the session with the given guid.
+
+        :param sessionkey: guid of the session.
+        :return: serialized session data, in bytes; or None
+        """
+        session = self.session
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            return await conn.scalar(
+                sa.select([session.c.data])
+                .where(session.c.guid == str(sessionkey)))
 
     async def get_failed_login_attempts(self, userkey, start, end):
         """
         Gets the number of failed login attempts for a user with a given key, in the last minutes.
 
-        :param userkey: key of the user for whom we are initializing the session
+        :param userkey: id of the account for which login attempts are counted
         :param start: start datetime to check for login attempts
         :param end: end datetime to check for login attempts
         :return:
         """
-        raise NotImplementedError
+        login_attempt = self.login_attempt
+        dbclient = get_client(readonly=True)
+        async with dbclient.acquire() as conn:
+            return await conn.scalar(
+                sa.select([sa.func.count()])
+                .where(sa.and_(login_attempt.c.user_id == userkey,
+                               login_attempt.c.creation_time >= start,
+                               login_attempt.c.creation_time <= end)))
 
-    async def save_login_attempt(self, userkey, client_ip, time):
+    async def save_login_attempt(self, userkey, client_ip, time, client_info=None):
         """
         Stores a failed login attempt in database
 
         :param userkey: key of the user for whom the login attempt must be stored
         :param client_ip: ip of the client for which the method is invoked
         :param time: timestamp of the login attempt
-        :return:
+        :param client_info: information about the client software
+        :return: id of the login attempt
         """
-        raise NotImplementedError
+        # the insert is batched with other login attempts reported in the same moment
+        return await get_batcher(self.login_attempt).insert(dict(
+            user_id=userkey,
+            creation_time=time,
+            client_ip=client_ip,
+            client_info=client_info
+        ))
 
+    @idempotent
     async def get_session_by_guid(self, session_guid):
+        return await self.read_first("get_session_by_guid", recheck_missing=True, session_guid=str(session_guid))
+
+    @idempotent
+    async def get_session_and_account(self, session_guid):
+        """
+        Gets the session with the given guid, together with its account and whether it is expired, using a single
+        query. Subclasses can override this method to read additional account information in the same query; overrides
+        are idempotent too.
+
+        :param session_guid: guid of the session.
+        :return: None if the session does not exist; otherwise session data, account data (None for anonymous
+                 sessions), expired flag
+        """
+        account = self.account
+        row = await self.read_first("get_session_and_account", recheck_missing=True, session_guid=str(session_guid))
+        if row is None:
+            return None
+        session_data = {column.name: row[column.name] for column in self.get_session_columns()}
+        account_data = {column.name: row["account_" + column.name] for column in account.c} \
+            if row["account_id"] is not None else None
+        return session_data, account_data, row["expired"]
+
+    @idempotent
+    async def get_session(self, session_id):
+        return await self.read_first("get_session", recheck_missing=True, session_id=session_id)
+
+    async def delete_expired_sessions(self, before, limit):
+        """
+        Deletes a bounded batch of sessions expired before the given time.
+
+        :param before: sessions expired before this time are deleted.
+        :param limit: maximum number of sessions to delete.
+        :return: the number of deleted sessions
+        """
         session = self.session
+        ids = sa.select([session.c.id]).where(session.c.expiration_time < before).limit(limit)
         dbclient = get_client()
         async with dbclient.acquire() as conn:
-            result = await conn.execute(
-                session.select()
-                .where(session.c.guid == session_guid))
-            return await result.first()
+            result = await conn.execute(session.delete().where(session.c.id.in_(ids)))
+            return result.rowcount
 
-    async def get_session(self, session_id):
-        session = self.session
+    async def delete_login_attempts(self, before, limit):
+        """
+        Deletes a bounded batch of login attempts created before the given time.
+
+        :param before: login attempts created before this time are deleted.
+        :param limit: maximum number of login attempts to delete.
+        :return: the number of deleted login attempts
+        """
+        login_attempt = self.login_attempt
+        ids = sa.select([login_attempt.c.id]).where(login_attempt.c.creation_time < before).limit(limit)
+        dbclient = get_client()
+        async with dbclient.acquire() as conn:
+            result = await conn.execute(login_attempt.delete().where(login_attempt.c.id.in_(ids)))
+            return result.rowcount
+
+    async def touch_sessions(self, expirations, batch_size=500):
+        """
+        Updates the expiration time of many sessions, with a single UPDATE command per batch.
+        The expiration time of a session is never reduced.
+
+        :param expirations: dictionary of expiration times by session guid.
+        :param batch_size: maximum number of sessions updated by a single command.
+        """
+        items = list(expirations.items())
         dbclient = get_client()
         async with dbclient.acquire() as conn:
-            result = await conn.execute(
-                session.select()
-                .where(session.c.id == session_id))
-            return await result.first()
\ No newline at end of file
+            for i in range(0, len(items), batch_size):
+                batch = items[i:i + batch_size]
+                values = []
+                params = {}
+                for j, (guid, expiration) in enumerate(batch):
+                    values.append("(%(guid_{0})s::uuid, %(expiration_{0})s::timestamp)".format(j))
+                    params["guid_{}".format(j)] = guid
+                    params["expiration_{}".format(j)] = expiration
+                await conn.execute(
+                    "UPDATE {} AS s SET expiration_time = v.expiration_time "
+                    "FROM (VALUES {}) AS v(guid, expiration_time) "
+                    "WHERE s.guid = v.guid AND s.expiration_time < v.expiration_time"
+                    .format(self.session.name, ", ".join(values)), params)
@@ -0,0 +1,243 @@
+"""
+ This module contains an instrumented wrapper of the aiopg.sa engine, that limits the number of connections in use.
+
+ Requests waiting for a connection longer than acquire_timeout fail fast with PoolTimeout, instead of queuing
+ indefinitely behind a saturated database; in adaptive mode, the limit of connections in use grows or shrinks within
+ the configured bounds, depending on the time spent waiting for connections.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from weakref import WeakKeyDictionary
+from dal.exceptions import PoolTimeout
+
+
+logger = logging.getLogger(__name__)
+
+pool_defaults = {
+    "acquire_timeout": 5.0,  # seconds; None to wait indefinitely
+    "retry_after": 1,  # seconds, suggested to clients when a connection cannot be acquired in time
+    "prewarm": True,  # whether to open the connections before serving requests
+    "adaptive": False,  # whether to adapt the limit of connections in use between minsize and maxsize
+    "adaptive_interval": 5.0,  # seconds between adaptations of the limit
+    "grow_wait": 0.01,  # average wait time (seconds) above which the limit is increased
+    "shrink_wait": 0.001  # average wait time (seconds) below which an underused limit is decreased
+}
+
+
+class AcquireContext:
+    """
+    Asynchronous context manager returned by InstrumentedEngine.acquire.
+    """
+    __slots__ = ("engine", "conn")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.conn = None
+
+    async def __aenter__(self):
+        self.conn = await self.engine.get_connection()
+        return self.conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        conn, self.conn = self.conn, None
+        self.engine.release(conn)
+
+
+class InstrumentedEngine:
+    """
+    Wraps an aiopg.sa engine, measuring the acquisition of connections and limiting the number of connections in use.
+    The wrapped engine is created with maxsize connections, which is the upper bound of the limit.
+    """
+    def __init__(self, engine, minsize, maxsize, options=None, loop=None, timer=time.monotonic):
+        options = dict(pool_defaults, **(options or {}))
+        if not 0 < minsize <= maxsize:
+            raise ValueError("The pool size must satisfy 0 < minsize <= maxsize.")
+        self.engine = engine
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.acquire_timeout = options["acquire_timeout"]
+        self.retry_after = options["retry_after"]
+        self.prewarm_enabled = options["prewarm"]
+        self.adaptive = options["adaptive"]
+        self.adaptive_interval = options["adaptive_interval"]
+        self.grow_wait = options["grow_wait"]
+        self.shrink_wait = options["shrink_wait"]
+        self.limit = minsize if self.adaptive else maxsize
+        self.loop = loop or asyncio.get_event_loop()
+        self.timer = timer
+        self.in_use = 0
+        self.waiters = deque()
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.opened_at = WeakKeyDictionary()  # time of first use, by raw connection
+        # metrics of the current adaptation window
+        self._window_acquisitions = 0
+        self._window_wait = 0.0
+        self._window_peak = 0
+        self._window_timeouts = 0
+
+    def acquire(self):
+        """
+        Returns an asynchronous context manager that acquires a connection and releases it on exit.
+        """
+        return AcquireContext(self)
+
+    async def get_connection(self):
+        """
+        Acquires a connection, waiting at most acquire_timeout seconds for a free slot and for the connection.
+        Connections acquired with this method must be released with the release method.
+
+        :raises PoolTimeout: if a connection cannot be acquired in time.
+        """
+        start = self.timer()
+        if self.in_use < self.limit and not self.waiters:
+            self.in_use += 1
+        else:
+            await self._wait_slot()
+        conn = None
+        try:
+            if self.acquire_timeout is None:
+                conn = await self.engine.acquire()
+            else:
+                # the connection may have to be opened: the time spent waiting for a slot is deducted
+                remaining = max(0.0, self.acquire_timeout - (self.timer() - start))
+                conn = await asyncio.wait_for(self.engine.acquire(), remaining)
+            wait = self.timer() - start
+            raw_connection = getattr(conn, "connection", conn)
+            if raw_connection not in self.opened_at:
+                self.opened_at[raw_connection] = start
+            self.acquisitions += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self._window_acquisitions += 1
+            self._window_wait += wait
+            self._window_peak = max(self._window_peak, self.in_use)
+            return conn
+        except asyncio.TimeoutError:
+            self._release_slot()
+            raise self._timeout()
+        except BaseException:
+            try:
+                if conn is not None:
+                    self.engine.release(conn)
+            finally:
+                self._release_slot()
+            raise
+
+    def _timeout(self):
+        self.timeouts += 1
+        self._window_timeouts += 1
+        return PoolTimeout("A database connection could not be acquired in {} seconds "
+                           "({} in use, {} waiting).".format(self.acquire_timeout, self.in_use, len(self.waiters)),
+                           retry_after=self.retry_after)
+
+    async def _wait_slot(self):
+        # slots are handed over to waiters in order by _release_slot
+        future = asyncio.Future(loop=self.loop)
+        self.waiters.append(future)
+        try:
+            await asyncio.wait([future], timeout=self.acquire_timeout)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        if not future.done():
+            self._abandon(future)
+            raise self._timeout()
+
+    def _abandon(self, future):
+        if future.done() and not future.cancelled():
+            # the slot was handed over in the meantime: pass it to the next waiter
+            self._release_slot()
+            return
+        future.cancel()
+        try:
+            self.waiters.remove(future)
+        except ValueError:
+            pass
+
+    def _release_slot(self):
+        self.in_use -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self.waiters and self.in_use < self.limit:
+            future = self.waiters.popleft()
+            if not future.done():
+                self.in_use += 1
+                future.set_result(None)
+
+    def release(self, conn):
+        """
+        Releases a connection acquired with get_connection.
+        """
+        try:
+            self.engine.release(conn)
+        finally:
+            self._release_slot()
+
+    async def prewarm(self):
+        """
+        Opens the connections allowed by the current limit, so the first requests do not pay for their creation.
+        """
+        conns = []
+        try:
+            for _ in range(self.limit - self.in_use):
+                conn = await self.get_connection()
+                conns.append(conn)
+                await conn.scalar("SELECT 1")
+        finally:
+            for conn in conns:
+                self.release(conn)
+        logger.info("Database pool warmed up with %d connections", len(conns))
+
+    async def adjust(self):
+        """
+        Adapts the limit of connections in use to the wait times observed since the previous call, within minsize and
+        maxsize: the limit is increased when requests wait for connections, and decreased when connections are idle.
+        """
+        acquisitions, wait, peak = self._window_acquisitions, self._window_wait, self._window_peak
+        timeouts = self._window_timeouts
+        self._window_acquisitions = 0
+        self._window_timeouts = 0
+        self._window_wait = 0.0
+        self._window_peak = self.in_use
+        average_wait = wait / acquisitions if acquisitions else 0.0
+        previous = self.limit
+        if (average_wait > self.grow_wait or timeouts) and self.limit < self.maxsize:
+            self.limit += 1
+            self._wake_waiters()
+        elif average_wait < self.shrink_wait and peak < self.limit - 1 and self.limit > self.minsize:
+            self.limit -= 1
+        if self.limit != previous:
+            logger.info("Database pool limit changed from %d to %d (average wait %.4fs, peak in use %d)",
+                        previous, self.limit, average_wait, peak)
+
+    def connection_ages(self):
+        now = self.timer()
+        return [now - opened_at for opened_at in self.opened_at.values()]
+
+    def stats(self):
+        ages = self.connection_ages()
+        return {
+            "limit": self.limit,
+            "size": self.engine.size,
+            "free": self.engine.freesize,
+            "in_use": self.in_use,
+            "waiting": len(self.waiters),
+            "acquisitions": self.acquisitions,
+            "timeouts": self.timeouts,
+            "average_wait": self.total_wait / self.acquisitions if self.acquisitions else 0.0,
+            "max_wait": self.max_wait,
+            "max_connection_age": max(ages) if ages else 0.0,
+            "average_connection_age": sum(ages) / len(ages) if ages else 0.0
+        }
+
+    def close(self):
+        self.engine.close()
+
+    async def wait_closed(self):
+        await self.engine.wait_closed()
@@ -2,6 +2,7 @@ import sqlalchemy as sa
 from sqlalchemy import Column, PrimaryKeyConstraint
 from sqlalchemy.schema import ForeignKey
 from dal.membership import MembershipStore
+from dal.statements import prepare_statements
 
 __all__ = ["app_user_session", "choice"]
 
@@ -19,6 +20,7 @@ account = sa.Table(
     Column("creation_time", sa.DateTime, nullable=False),
     Column("password_reset_key", sa.String(36), nullable=True),
     Column("confirmation_key", sa.String(36), nullable=True),
+    Column("banned", sa.Boolean, nullable=False, default=False),
     PrimaryKeyConstraint("id", name="app_user_account_pkey"))
 
 
@@ -42,9 +44,11 @@ session = sa.Table(
     Column("expiration_time", sa.DateTime, nullable=False),
     Column("client_ip", sa.String, nullable=False),
     Column("client_info", sa.String, nullable=False),
+    Column("data", sa.LargeBinary, nullable=True),
     sa.PrimaryKeyConstraint("id", name="app_user_session_pkey"))
 
 
+@prepare_statements
 class PublicMembershipStore(MembershipStore):
     """
     A membership store for the public area of the web application.
@@ -0,0 +1,56 @@
+"""
+ This module contains the task-local state used to route queries between the primary database and its replicas.
+
+ Read-only queries are routed to replicas, unless the current task wrote to the primary before: in that case, reads
+ stay on the primary so they observe the changes (replicas apply them with a delay). Since a server task may handle
+ many requests on the same connection, the state is reset at the beginning of each request.
+"""
+import asyncio
+from weakref import WeakSet
+
+
+# tasks that must read from the primary database
+_primary_tasks = WeakSet()
+
+
+def get_current_task():
+    try:
+        return asyncio.Task.current_task()
+    except AttributeError:
+        # Python >= 3.9
+        return asyncio.current_task()
+
+
+def require_primary():
+    """
+    Routes the following queries of the current task to the primary database.
+    """
+    task = get_current_task()
+    if task is not None:
+        _primary_tasks.add(task)
+
+
+def is_primary_required():
+    """
+    Returns a value indicating whether the queries of the current task must be routed to the primary database.
+    """
+    task = get_current_task()
+    return task is not None and task in _primary_tasks
+
+
+def reset_routing():
+    """
+    Allows the queries of the current task to be routed to replicas again; to be called when a new request begins.
+    """
+    task = get_current_task()
+    if task is not None:
+        _primary_tasks.discard(task)
+
+
+async def on_primary(awaitable):
+    """
+    Awaits the given awaitable in the current task, routing its queries to the primary database; used when a query
+    is executed by a different task on behalf of a task bound to the primary.
+    """
+    require_primary()
+    return await awaitable
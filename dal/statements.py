@@ -0,0 +1,50 @@
+"""
+ This module contains the cache of compiled SQL statements.
+
+ aiopg.sa compiles SQLAlchemy expressions to SQL strings at every execution; for the statements executed at every
+ request, the expressions are compiled only once (with named bound parameters) and executed as SQL strings.
+"""
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+
+
+dialect = PGDialect_psycopg2()
+
+
+class CompiledStatement:
+    """
+    A SQLAlchemy statement compiled once for PostgreSQL, executed with bound parameters.
+    """
+    def __init__(self, statement):
+        compiled = statement.compile(dialect=dialect)
+        self.sql = str(compiled)
+        # values of parameters defined by the statement itself (e.g. literal function arguments)
+        self.defaults = {key: value for key, value in compiled.params.items() if value is not None}
+
+    def params(self, **values):
+        """
+        Returns the parameters to execute this statement with the given values.
+        """
+        if not self.defaults:
+            return values
+        params = dict(self.defaults)
+        params.update(values)
+        return params
+
+    async def execute(self, conn, **values):
+        """
+        Executes this statement with the given connection and values of the bound parameters.
+        """
+        return await conn.execute(self.sql, self.params(**values))
+
+    def __str__(self):
+        return self.sql
+
+
+def prepare_statements(store_type):
+    """
+    Class decorator that compiles the statements returned by the get_statements class method of a store type,
+    setting them in its statements attribute. This way, statements are compiled once per table, at import time.
+    """
+    store_type.statements = {name: CompiledStatement(statement)
+                             for name, statement in store_type.get_statements().items()}
+    return store_type
@@ -0,0 +1,16 @@
+"""
+ Runs the unit tests of the application: python runtests.py
+ Tests run from the application folder, like the application, which reads its configuration from there.
+"""
+import os
+import sys
+import unittest
+
+
+if __name__ == "__main__":
+    root = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, root)
+    os.chdir(os.path.join(root, "app"))
+    suite = unittest.TestLoader().discover(os.path.join(root, "tests"), top_level_dir=root)
+    result = unittest.TextTestRunner(verbosity=2).run(suite)
+    sys.exit(not result.wasSuccessful())
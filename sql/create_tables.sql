@@ -6,6 +6,7 @@ DROP TABLE IF EXISTS admin_user_login_attempt CASCADE;
 DROP TABLE IF EXISTS admin_user_session CASCADE;
 DROP TABLE IF EXISTS admin_user_role CASCADE;
 DROP TABLE IF EXISTS admin_role CASCADE;
+DROP TABLE IF EXISTS scheduled_job CASCADE;
 DROP TABLE IF EXISTS admin_user CASCADE;
 
 -- tables for public area users
@@ -17,7 +18,8 @@ CREATE TABLE app_user(
   salt CHAR(50),
   creation_time TIMESTAMP NOT NULL,
   password_reset_key UUID NULL,
-  confirmation_key UUID NULL
+  confirmation_key UUID NULL,
+  banned BOOLEAN NOT NULL DEFAULT FALSE
 );
 
 CREATE TABLE app_user_login_attempt(
@@ -37,9 +39,13 @@ CREATE TABLE app_user_session(
   expiration_time TIMESTAMP NOT NULL,
   client_ip VARCHAR(50) NOT NULL,
   client_info TEXT NULL,
+  data BYTEA NULL,
   UNIQUE(guid)
 );
 
+CREATE INDEX app_user_session_expiration_time_idx ON app_user_session(expiration_time);
+CREATE INDEX app_user_login_attempt_creation_time_idx ON app_user_login_attempt(creation_time);
+
 -- tables for admin area users
 CREATE TABLE admin_user(
   id SERIAL PRIMARY KEY,
@@ -49,7 +55,8 @@ CREATE TABLE admin_user(
   salt CHAR(50),
   creation_time TIMESTAMP NOT NULL,
   password_reset_key UUID NULL,
-  confirmation_key UUID NULL
+  confirmation_key UUID NULL,
+  banned BOOLEAN NOT NULL DEFAULT FALSE
 );
 
 CREATE TABLE admin_user_login_attempt(
@@ -69,9 +76,13 @@ CREATE TABLE admin_user_session(
   expiration_time TIMESTAMP NOT NULL,
   client_ip VARCHAR(50) NOT NULL,
   client_info TEXT NULL,
+  data BYTEA NULL,
   UNIQUE (guid)
 );
 
+CREATE INDEX admin_user_session_expiration_time_idx ON admin_user_session(expiration_time);
+CREATE INDEX admin_user_login_attempt_creation_time_idx ON admin_user_login_attempt(creation_time);
+
 CREATE TABLE admin_role(
   id SERIAL PRIMARY KEY,
   key_name VARCHAR(50) NOT NULL,
@@ -84,4 +95,9 @@ CREATE TABLE admin_user_role(
   admin_user_id INTEGER REFERENCES admin_user(id),
   admin_role_id INTEGER REFERENCES admin_role(id),
   UNIQUE (admin_user_id, admin_role_id)
-);
\ No newline at end of file
+);
+
+CREATE TABLE scheduled_job(
+  name VARCHAR(100) PRIMARY KEY,
+  last_run TIMESTAMP NOT NULL
+);
@@ -0,0 +1,126 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from app.handlers.admission import AdmissionController, admission_middleware
+
+
+class AdmissionControllerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def get_controller(self, max_in_flight=1, max_queue=1, queue_timeout=1.0):
+        return AdmissionController("public", max_in_flight, max_queue, queue_timeout, retry_after=2, loop=self.loop)
+
+    def test_admits_up_to_the_limit(self):
+        controller = self.get_controller(max_in_flight=2, max_queue=0)
+
+        async def run():
+            return [await controller.admit() for _ in range(3)]
+
+        self.assertEqual(self.loop.run_until_complete(run()), [True, True, False])
+        self.assertEqual(controller.stats()["rejected"], 1)
+
+    def test_queued_request_is_admitted_on_release(self):
+        controller = self.get_controller()
+
+        async def run():
+            await controller.admit()
+            waiter = asyncio.ensure_future(controller.admit())
+            await asyncio.sleep(0.01)
+            self.assertEqual(controller.stats()["queued"], 1)
+            controller.release()
+            return await waiter
+
+        self.assertTrue(self.loop.run_until_complete(run()))
+        self.assertEqual(controller.in_flight, 1)
+
+    def test_queued_request_times_out(self):
+        controller = self.get_controller(queue_timeout=0.01)
+
+        async def run():
+            await controller.admit()
+            return await controller.admit()
+
+        self.assertFalse(self.loop.run_until_complete(run()))
+        stats = controller.stats()
+        self.assertEqual(stats["timed_out"], 1)
+        self.assertEqual(stats["queued"], 0)
+
+    def test_cancelled_request_leaves_the_queue(self):
+        controller = self.get_controller()
+
+        async def run():
+            await controller.admit()
+            waiter = asyncio.ensure_future(controller.admit())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.sleep(0.01)
+            controller.release()
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(controller.stats()["queued"], 0)
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            self.get_controller(max_in_flight=0)
+
+
+class AdmissionMiddlewareTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_saturated_area_returns_503(self):
+        controller = AdmissionController("public", 1, 0, 1.0, retry_after=2, loop=self.loop)
+        app = {"admission": {"public": controller}}
+        release = asyncio.Event()
+
+        async def area_handler(request):
+            await release.wait()
+            return "ok"
+        area_handler.area = "public"
+
+        async def inner_handler(request):
+            # the handler of the next middleware, which has no area
+            return await area_handler(request)
+
+        def get_request():
+            return SimpleNamespace(match_info=SimpleNamespace(handler=area_handler))
+
+        async def run():
+            handler = await admission_middleware(app, inner_handler)
+            first = asyncio.ensure_future(handler(get_request()))
+            await asyncio.sleep(0.01)
+            rejected = await handler(get_request())
+            release.set()
+            return await first, rejected
+
+        accepted, rejected = self.loop.run_until_complete(run())
+        self.assertEqual(accepted, "ok")
+        self.assertEqual(rejected.status, 503)
+        self.assertEqual(rejected.headers["Retry-After"], "2")
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_handlers_without_area_are_not_limited(self):
+        app = {"admission": {}}
+
+        async def static_handler(request):
+            return "ok"
+
+        async def run():
+            handler = await admission_middleware(app, static_handler)
+            return await handler(SimpleNamespace(match_info=SimpleNamespace(handler=static_handler)))
+
+        self.assertEqual(self.loop.run_until_complete(run()), "ok")
@@ -0,0 +1,98 @@
+import unittest
+from core.caching import LRUCache
+from bll.sessioncache import SessionCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_get_and_set(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_evicts_least_recently_used(self):
+        evicted = []
+        cache = LRUCache(maxsize=2, on_evict=lambda key, value: evicted.append((key, value)))
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.keys(), ["a", "c"])
+        self.assertEqual(evicted, [("b", 2)])
+        self.assertEqual(cache.evictions, 1)
+
+    def test_expiration(self):
+        timer = FakeTimer()
+        evicted = []
+        cache = LRUCache(maxsize=10, ttl=5, timer=timer, on_evict=lambda key, value: evicted.append(key))
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=20)
+        timer.now = 10
+        self.assertNotIn("a", cache)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(evicted, ["a"])
+
+    def test_delete_does_not_call_on_evict(self):
+        evicted = []
+        cache = LRUCache(maxsize=10, on_evict=lambda key, value: evicted.append(key))
+        cache.set("a", 1)
+        self.assertTrue(cache.delete("a"))
+        self.assertFalse(cache.delete("a"))
+        self.assertEqual(evicted, [])
+
+    def test_invalid_maxsize(self):
+        with self.assertRaises(ValueError):
+            LRUCache(maxsize=0)
+
+
+class SessionCacheTestCase(unittest.TestCase):
+
+    def test_get_and_set(self):
+        cache = SessionCache(maxsize=10)
+        cache.set("s1", {"guid": "s1"}, {"id": 1})
+        self.assertEqual(cache.get("s1"), ({"guid": "s1"}, {"id": 1}))
+        self.assertIsNone(cache.get("s2"))
+
+    def test_invalidate_account(self):
+        cache = SessionCache(maxsize=10)
+        cache.set("s1", {}, {"id": 1})
+        cache.set("s2", {}, {"id": 1})
+        cache.set("s3", {}, {"id": 2})
+        cache.invalidate_account(1)
+        self.assertIsNone(cache.get("s1"))
+        self.assertIsNone(cache.get("s2"))
+        self.assertIsNotNone(cache.get("s3"))
+
+    def test_invalidate_session(self):
+        cache = SessionCache(maxsize=10)
+        cache.set("s1", {}, {"id": 1})
+        cache.invalidate_session("s1")
+        self.assertIsNone(cache.get("s1"))
+        self.assertEqual(cache.account_sessions, {})
+
+    def test_eviction_at_capacity_prunes_index(self):
+        cache = SessionCache(maxsize=100)
+        for i in range(1000):
+            cache.set("s{}".format(i), {}, {"id": i})
+        self.assertEqual(len(cache.entries), 100)
+        self.assertEqual(len(cache.account_sessions), 100)
+        self.assertEqual(set(cache.account_sessions), set(range(900, 1000)))
+        self.assertEqual(cache.stats()["evictions"], 900)
+
+    def test_anonymous_sessions_are_not_indexed(self):
+        cache = SessionCache(maxsize=10)
+        cache.set("s1", {})
+        self.assertEqual(cache.account_sessions, {})
+        self.assertEqual(cache.get("s1"), ({}, None))
@@ -0,0 +1,71 @@
+import gettext
+import os
+import shutil
+import tempfile
+import unittest
+from core.localization.catalogs import Catalog, write_catalog
+
+
+class CatalogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "en.mo")
+        self.table = {
+            "site.name": "Name",
+            "site.about": "About",
+            "index.title": "Title with ünicode ✓",
+            "empty": ""
+        }
+        write_catalog(self.path, self.table)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        catalog = Catalog(self.path)
+        try:
+            for key, value in self.table.items():
+                self.assertEqual(catalog.get(key), value)
+        finally:
+            catalog.close()
+
+    def test_missing_keys(self):
+        catalog = Catalog(self.path)
+        try:
+            self.assertIsNone(catalog.get("site.missing"))
+            self.assertEqual(catalog.get("zzz", "default"), "default")
+            self.assertNotIn("site.missing", catalog)
+            self.assertIn("site.name", catalog)
+        finally:
+            catalog.close()
+
+    def test_readable_by_gettext(self):
+        with open(self.path, "rb") as f:
+            translations = gettext.GNUTranslations(f)
+        self.assertEqual(translations.gettext("site.name"), "Name")
+        self.assertEqual(translations.gettext("index.title"), "Title with ünicode ✓")
+
+    def test_rewrite_replaces_catalog(self):
+        write_catalog(self.path, {"site.name": "New name"})
+        catalog = Catalog(self.path)
+        try:
+            self.assertEqual(catalog.get("site.name"), "New name")
+            self.assertIsNone(catalog.get("site.about"))
+        finally:
+            catalog.close()
+        self.assertEqual(os.listdir(self.folder), ["en.mo"])
+
+    def test_invalid_catalog(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * 28)
+        with self.assertRaises(ValueError):
+            Catalog(self.path).get("site.name")
+
+    def test_empty_catalog(self):
+        write_catalog(self.path, {})
+        catalog = Catalog(self.path)
+        try:
+            self.assertIsNone(catalog.get("site.name"))
+        finally:
+            catalog.close()
@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+from dal.coalescing import idempotent, IdempotentMethods
+
+
+class Store(metaclass=IdempotentMethods):
+
+    def __init__(self):
+        self.queries = 0
+
+    @idempotent
+    async def get_session(self, guid):
+        self.queries += 1
+        await asyncio.sleep(0.01)
+        return {"guid": guid}, {"id": 1}
+
+
+class ExtendedStore(Store):
+
+    async def get_session(self, guid):
+        session_data, account_data = await super().get_session(guid)
+        account_data["extra"] = True
+        return session_data, account_data
+
+
+class IdempotentTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def lookup(self, store, count=3):
+        async def run():
+            return await asyncio.gather(*[store.get_session("g") for _ in range(count)])
+        return self.loop.run_until_complete(run())
+
+    def test_concurrent_calls_share_a_query(self):
+        store = Store()
+        results = self.lookup(store)
+        self.assertEqual(store.queries, 1)
+        self.assertEqual(results[0], ({"guid": "g"}, {"id": 1}))
+
+    def test_overrides_are_coalesced(self):
+        store = ExtendedStore()
+        results = self.lookup(store)
+        self.assertEqual(store.queries, 1)
+        self.assertTrue(getattr(ExtendedStore.get_session, "idempotent", False))
+        self.assertEqual(results[0][1], {"id": 1, "extra": True})
+
+    def test_callers_receive_copies(self):
+        store = Store()
+        results = self.lookup(store)
+        results[0][0]["expiration_time"] = "changed"
+        self.assertNotIn("expiration_time", results[1][0])
+        self.assertIsNot(results[0][0], results[1][0])
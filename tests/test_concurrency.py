@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from core.concurrency import SingleFlight
+
+
+class SingleFlightTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_concurrent_calls_are_coalesced(self):
+        flight = SingleFlight(loop=self.loop)
+        executions = []
+
+        async def operation(value):
+            executions.append(value)
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        async def run():
+            return await asyncio.gather(*[flight.do("key", lambda: operation(21)) for _ in range(5)])
+
+        results = self.loop.run_until_complete(run())
+        self.assertEqual(results, [42] * 5)
+        self.assertEqual(executions, [21])
+        self.assertEqual(flight.stats(), {"in_flight": 0, "executions": 1, "coalesced": 4})
+
+    def test_different_keys_are_not_coalesced(self):
+        flight = SingleFlight(loop=self.loop)
+
+        async def operation(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        async def run():
+            return await asyncio.gather(flight.do("a", lambda: operation(1)), flight.do("b", lambda: operation(2)))
+
+        self.assertEqual(self.loop.run_until_complete(run()), [1, 2])
+        self.assertEqual(flight.executions, 2)
+
+    def test_sequential_calls_are_executed_again(self):
+        flight = SingleFlight(loop=self.loop)
+
+        async def operation():
+            return 1
+
+        self.loop.run_until_complete(flight.do("key", operation))
+        self.loop.run_until_complete(flight.do("key", operation))
+        self.assertEqual(flight.executions, 2)
+
+    def test_exceptions_are_shared(self):
+        flight = SingleFlight(loop=self.loop)
+
+        async def operation():
+            await asyncio.sleep(0.01)
+            raise ValueError("failure")
+
+        async def run():
+            return await asyncio.gather(flight.do("key", operation), flight.do("key", operation),
+                                        return_exceptions=True)
+
+        results = self.loop.run_until_complete(run())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.executions, 1)
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        flight = SingleFlight(loop=self.loop)
+
+        async def operation():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def run():
+            first = asyncio.ensure_future(flight.do("key", operation))
+            second = asyncio.ensure_future(flight.do("key", operation))
+            await asyncio.sleep(0.005)
+            first.cancel()
+            return await second
+
+        self.assertEqual(self.loop.run_until_complete(run()), "done")
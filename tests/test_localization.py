@@ -0,0 +1,58 @@
+import unittest
+from app.handlers.localization import CultureSet, parse_accept_language, negotiate_culture
+
+
+class ParseAcceptLanguageTestCase(unittest.TestCase):
+
+    def test_sorted_by_quality(self):
+        self.assertEqual(parse_accept_language("en;q=0.8, it-CH, it;q=0.9, *;q=0.5"),
+                         [("it-CH", 1.0), ("it", 0.9), ("en", 0.8), ("*", 0.5)])
+
+    def test_same_quality_keeps_header_order(self):
+        self.assertEqual(parse_accept_language("fr, de, en"), [("fr", 1.0), ("de", 1.0), ("en", 1.0)])
+
+    def test_invalid_and_out_of_range_qualities(self):
+        self.assertEqual(parse_accept_language("en;q=abc, it;q=2, , fr;q=-1"),
+                         [("it", 1.0), ("en", 0.0), ("fr", 0.0)])
+
+
+class NegotiateCultureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cultures = CultureSet(["en", "it", "en-GB"], "en")
+
+    def negotiate(self, header):
+        return negotiate_culture(header, self.cultures)
+
+    def test_exact_match(self):
+        self.assertEqual(self.negotiate("it"), "it")
+
+    def test_match_is_case_insensitive(self):
+        self.assertEqual(self.negotiate("EN-gb"), "en-GB")
+
+    def test_quality_order(self):
+        self.assertEqual(self.negotiate("it;q=0.5, en-GB;q=0.9"), "en-GB")
+
+    def test_lookup_removes_subtags(self):
+        self.assertEqual(self.negotiate("it-CH"), "it")
+
+    def test_more_specific_culture(self):
+        cultures = CultureSet(["en-GB", "it"], "it")
+        self.assertEqual(negotiate_culture("en", cultures), "en-GB")
+
+    def test_unsupported_languages_fall_back_to_default(self):
+        self.assertEqual(self.negotiate("fr, de"), "en")
+
+    def test_wildcard_matches_default(self):
+        self.assertEqual(self.negotiate("fr, *;q=0.5"), "en")
+
+    def test_wildcard_skips_excluded_default(self):
+        cultures = CultureSet(["en", "it"], "en")
+        self.assertEqual(negotiate_culture("en;q=0, *", cultures), "it")
+
+    def test_excluded_cultures_are_not_matched(self):
+        self.assertEqual(self.negotiate("en-GB;q=0, en-AU"), "en")
+        self.assertEqual(self.negotiate("fr, en;q=0"), "it")
+
+    def test_zero_quality_is_not_acceptable(self):
+        self.assertEqual(self.negotiate("it;q=0"), "en")
@@ -0,0 +1,18 @@
+import unittest
+from core.localization.tables import flatten, build_tables
+
+
+class TablesTestCase(unittest.TestCase):
+
+    def test_flatten(self):
+        self.assertEqual(flatten({"site": {"name": "Name", "menu": {"home": "Home"}}, "title": "Title"}),
+                         {"site.name": "Name", "site.menu.home": "Home", "title": "Title"})
+
+    def test_missing_keys_are_reported_and_left_out(self):
+        tables, missing = build_tables({
+            "en": {"site": {"name": "Name", "about": "About"}},
+            "it": {"site": {"name": "Nome"}}
+        })
+        self.assertEqual(missing, {"it": ["site.about"]})
+        self.assertNotIn("site.about", tables["it"])
+        self.assertEqual(tables["en"]["site.about"], "About")
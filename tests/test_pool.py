@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+from dal.exceptions import PoolTimeout
+from dal.pool import InstrumentedEngine
+
+
+class FakeConnection:
+
+    async def scalar(self, query):
+        return 1
+
+
+class FakeEngine:
+    """
+    Engine returning connections after a delay.
+    """
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.acquired = 0
+        self.released = 0
+        self.size = 0
+        self.freesize = 0
+
+    async def acquire(self):
+        await asyncio.sleep(self.delay)
+        self.acquired += 1
+        return FakeConnection()
+
+    def release(self, conn):
+        self.released += 1
+
+
+class InstrumentedEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def get_engine(self, engine=None, maxsize=2, **options):
+        return InstrumentedEngine(engine or FakeEngine(), 1, maxsize, options, loop=self.loop)
+
+    def test_acquire_and_release(self):
+        engine = self.get_engine()
+
+        async def run():
+            async with engine.acquire() as conn:
+                self.assertEqual(engine.in_use, 1)
+                return await conn.scalar("SELECT 1")
+
+        self.assertEqual(self.loop.run_until_complete(run()), 1)
+        self.assertEqual(engine.in_use, 0)
+        self.assertEqual(engine.engine.released, 1)
+        self.assertEqual(engine.stats()["acquisitions"], 1)
+
+    def test_waiting_for_a_slot_times_out(self):
+        engine = self.get_engine(maxsize=1, acquire_timeout=0.05, retry_after=3)
+
+        async def run():
+            conn = await engine.get_connection()
+            try:
+                with self.assertRaises(PoolTimeout) as context:
+                    await engine.get_connection()
+                self.assertEqual(context.exception.retry_after, 3)
+            finally:
+                engine.release(conn)
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(engine.in_use, 0)
+        self.assertEqual(len(engine.waiters), 0)
+        self.assertEqual(engine.timeouts, 1)
+
+    def test_slow_connection_times_out(self):
+        engine = self.get_engine(FakeEngine(delay=1), acquire_timeout=0.05)
+
+        with self.assertRaises(PoolTimeout):
+            self.loop.run_until_complete(engine.get_connection())
+        self.assertEqual(engine.in_use, 0)
+        self.assertEqual(engine.timeouts, 1)
+
+    def test_waiters_are_served_in_order(self):
+        engine = self.get_engine(maxsize=1, acquire_timeout=1)
+        order = []
+
+        async def use(name):
+            async with engine.acquire():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(use("a"), use("b"), use("c"))
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertEqual(engine.in_use, 0)
+
+    def test_cancelled_waiter_releases_its_place(self):
+        engine = self.get_engine(maxsize=1, acquire_timeout=1)
+
+        async def run():
+            conn = await engine.get_connection()
+            waiter = asyncio.ensure_future(engine.get_connection())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(len(engine.waiters), 0)
+            engine.release(conn)
+            # the slot is available again
+            conn = await engine.get_connection()
+            engine.release(conn)
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(engine.in_use, 0)
+
+    def test_cancelled_connection_releases_the_slot(self):
+        engine = self.get_engine(FakeEngine(delay=1), acquire_timeout=5)
+
+        async def run():
+            task = asyncio.ensure_future(engine.get_connection())
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(engine.in_use, 0)
+
+    def test_bookkeeping_failure_releases_the_slot(self):
+        engine = self.get_engine()
+        engine.opened_at = None  # breaks the bookkeeping after the acquisition
+
+        with self.assertRaises(TypeError):
+            self.loop.run_until_complete(engine.get_connection())
+        self.assertEqual(engine.in_use, 0)
+        self.assertEqual(engine.engine.released, 1)
+
+    def test_adaptive_limit_grows_on_timeouts(self):
+        engine = self.get_engine(maxsize=3, adaptive=True, acquire_timeout=0.01)
+        self.assertEqual(engine.limit, 1)
+
+        async def run():
+            conn = await engine.get_connection()
+            with self.assertRaises(PoolTimeout):
+                await engine.get_connection()
+            engine.release(conn)
+            await engine.adjust()
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(engine.limit, 2)
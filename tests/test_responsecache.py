@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from aiohttp import web
+from app.handlers.areas import Area, request_context_key
+from app.handlers.cookies import CookieToken
+from app.handlers.responsecache import ResponseCache, AntiforgeryPlaceholder, ANTIFORGERY_PLACEHOLDER, \
+    get_antiforgery, get_response
+
+
+class FakeRequest(dict):
+    def __init__(self, path_qs="/", culture="en"):
+        super().__init__()
+        self.path_qs = path_qs
+        self.culture = culture
+        self.headers = {}
+
+
+class AntiforgeryPlaceholderTestCase(unittest.TestCase):
+
+    def test_placeholder(self):
+        antiforgery = lambda: "token"
+        placeholder = AntiforgeryPlaceholder(antiforgery)
+        self.assertFalse(placeholder.used)
+        self.assertEqual(placeholder(), ANTIFORGERY_PLACEHOLDER)
+        self.assertTrue(placeholder.used)
+        self.assertIs(get_antiforgery(placeholder), antiforgery)
+        self.assertIs(get_antiforgery(antiforgery), antiforgery)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+
+    def test_store_and_serve_with_token(self):
+        cache = ResponseCache(ttl=60, maxsize=10)
+        request = FakeRequest()
+        body = "<input value=\"{}\">".format(ANTIFORGERY_PLACEHOLDER).encode("utf-8")
+        cached = cache.store(request, web.Response(body=body))
+        self.assertIs(cache.get(request), cached)
+        self.assertTrue(cached.has_placeholder)
+        response = get_response(request, cached, lambda: "token")
+        self.assertEqual(response.body, b"<input value=\"token\">")
+
+    def test_responses_with_cookies_are_not_stored(self):
+        cache = ResponseCache(ttl=60, maxsize=10)
+        response = web.Response(body=b"page")
+        response.set_cookie("session", "value")
+        self.assertIsNone(cache.store(FakeRequest(), response))
+
+    def test_responses_with_pending_cookies_are_not_stored(self):
+        cache = ResponseCache(ttl=60, maxsize=10)
+        request = FakeRequest()
+        request.cookies_to_set = [CookieToken("nonce", "value")]
+        request.cookies_to_unset = []
+        self.assertIsNone(cache.store(request, web.Response(body=b"page")))
+        request.cookies_to_set = []
+        request.cookies_to_unset = ["session"]
+        self.assertIsNone(cache.store(request, web.Response(body=b"page")))
+        request.cookies_to_unset = []
+        self.assertIsNotNone(cache.store(request, web.Response(body=b"page")))
+
+
+class CachedHandlerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.area = SimpleNamespace(membership=None, antiforgery_signer=None)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def get_cached_response(self, request, handler):
+        return self.loop.run_until_complete(
+            Area._get_cached_response(self.area, request, handler, ResponseCache(ttl=60, maxsize=10)))
+
+    def test_sent_responses_cannot_use_the_placeholder(self):
+        async def handler(request):
+            request[request_context_key]["antiforgery"]()
+            return object()  # a response sent while rendering
+
+        request = FakeRequest()
+        request[request_context_key] = {}
+        with self.assertRaises(RuntimeError):
+            self.get_cached_response(request, handler)
+
+    def test_context_is_restored(self):
+        async def handler(request):
+            return web.Response(body=b"page")
+
+        request = FakeRequest()
+        request[request_context_key] = {}
+        response = self.get_cached_response(request, handler)
+        self.assertEqual(response.body, b"page")
+        self.assertIsNone(request[request_context_key]["antiforgery"])
@@ -0,0 +1,51 @@
+import unittest
+from bll.sessiondata import SessionData, serialize, deserialize, PLAIN, COMPRESSED
+
+
+class SerializationTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = {"cart": [1, 2, 3], "name": "Niño", "flag": True, "nested": {"a": None}}
+        value = serialize(data)
+        self.assertEqual(value[:1], PLAIN)
+        self.assertEqual(deserialize(value), data)
+
+    def test_large_values_are_compressed(self):
+        data = {"items": ["item"] * 200}
+        value = serialize(data)
+        self.assertEqual(value[:1], COMPRESSED)
+        self.assertEqual(deserialize(value), data)
+
+    def test_deserialize_memoryview(self):
+        # database drivers can return binary values as memoryview
+        self.assertEqual(deserialize(memoryview(serialize({"a": 1}))), {"a": 1})
+
+    def test_deserialize_empty(self):
+        self.assertEqual(deserialize(None), {})
+        self.assertEqual(deserialize(b""), {})
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            deserialize(b"x{}")
+
+
+class SessionDataTestCase(unittest.TestCase):
+
+    def test_modifications_are_tracked(self):
+        data = SessionData({"a": 1})
+        self.assertFalse(data.modified)
+        self.assertEqual(data["a"], 1)
+        self.assertFalse(data.modified)
+        data["b"] = 2
+        self.assertTrue(data.modified)
+
+    def test_delete_marks_modified(self):
+        data = SessionData({"a": 1})
+        del data["a"]
+        self.assertTrue(data.modified)
+        self.assertEqual(len(data), 0)
+
+    def test_round_trip(self):
+        data = SessionData()
+        data["user"] = {"theme": "dark"}
+        self.assertEqual(SessionData(deserialize(serialize(data.to_dict()))).to_dict(), {"user": {"theme": "dark"}})
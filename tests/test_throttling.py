@@ -0,0 +1,62 @@
+import unittest
+from bll.throttling import SlidingWindowLimiter
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlidingWindowLimiterTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.timer = FakeTimer()
+        self.limiter = SlidingWindowLimiter(limit=3, window=60, shards=4, timer=self.timer)
+
+    def test_limit(self):
+        for _ in range(2):
+            self.limiter.hit("a")
+        self.assertFalse(self.limiter.is_limited("a"))
+        self.limiter.hit("a")
+        self.assertTrue(self.limiter.is_limited("a"))
+        self.assertFalse(self.limiter.is_limited("b"))
+
+    def test_window_slides(self):
+        self.limiter.hit("a")
+        self.timer.now = 30
+        self.limiter.hit("a")
+        self.limiter.hit("a")
+        self.assertTrue(self.limiter.is_limited("a"))
+        self.timer.now = 61
+        self.assertEqual(self.limiter.count("a"), 2)
+        self.assertFalse(self.limiter.is_limited("a"))
+        self.timer.now = 91
+        self.assertEqual(self.limiter.count("a"), 0)
+
+    def test_events_are_bounded_by_limit(self):
+        for _ in range(100):
+            self.limiter.hit("a")
+        self.assertEqual(self.limiter.count("a"), 3)
+
+    def test_reset(self):
+        for _ in range(3):
+            self.limiter.hit("a")
+        self.limiter.reset("a")
+        self.assertEqual(self.limiter.count("a"), 0)
+        self.assertEqual(len(self.limiter), 0)
+
+    def test_expired_keys_are_pruned(self):
+        for i in range(100):
+            self.limiter.hit("key{}".format(i))
+        self.assertEqual(len(self.limiter), 100)
+        self.timer.now = 120
+        for _ in range(len(self.limiter.shards)):
+            self.limiter.hit("new")
+        self.assertEqual(len(self.limiter), 1)
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError):
+            SlidingWindowLimiter(limit=0, window=60)
@@ -0,0 +1,99 @@
+import unittest
+from types import SimpleNamespace
+from core.encryption.signing import Signer, urlsafe_encode, urlsafe_decode
+from core.encryption.tokens import TokenSerializer, MAX_TOKEN_LENGTH
+
+
+class SignerTestCase(unittest.TestCase):
+
+    def test_sign_and_unsign(self):
+        signer = Signer("secret", "test")
+        signed = signer.sign("value.with.dots")
+        self.assertEqual(signer.unsign(signed), "value.with.dots")
+        self.assertEqual(signer.unsign(signed.encode("utf-8")), "value.with.dots")
+
+    def test_tampered_values_are_rejected(self):
+        signer = Signer("secret", "test")
+        signed = signer.sign("value")
+        self.assertIsNone(signer.unsign("other" + signed[5:]))
+        self.assertIsNone(signer.unsign(signed[:-1]))
+        self.assertIsNone(signer.unsign("value"))
+
+    def test_keys_depend_on_purpose_and_secret(self):
+        signed = Signer("secret", "a").sign("value")
+        self.assertIsNone(Signer("secret", "b").unsign(signed))
+        self.assertIsNone(Signer("other", "a").unsign(signed))
+
+    def test_urlsafe_encoding(self):
+        for data in (b"", b"a", b"ab", b"abc", b"\xff\xfe\xfd\xfc"):
+            encoded = urlsafe_encode(data)
+            self.assertNotIn("=", encoded)
+            self.assertEqual(urlsafe_decode(encoded), data)
+
+
+class TokenSerializerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.serializer = TokenSerializer("secret", "session-cookie")
+
+    def test_round_trip(self):
+        token = self.serializer.dumps("s", "f4b6a1e2-0000-11e6-8000-000000000000")
+        self.assertTrue(TokenSerializer.is_token(token))
+        self.assertEqual(self.serializer.loads(token), ("s", "f4b6a1e2-0000-11e6-8000-000000000000"))
+
+    def test_values_can_contain_separators(self):
+        token = self.serializer.dumps("a", "guid:1.5")
+        self.assertEqual(self.serializer.loads(token), ("a", "guid:1.5"))
+
+    def test_kind_cannot_contain_separator(self):
+        with self.assertRaises(ValueError):
+            self.serializer.dumps("a.b", "value")
+
+    def test_invalid_tokens(self):
+        token = self.serializer.dumps("s", "value")
+        for invalid in (None, "", "garbage", token[:-2], token.replace("value", "other"),
+                        "v2" + token[2:], "v1." + "x" * MAX_TOKEN_LENGTH):
+            self.assertEqual(self.serializer.loads(invalid), (None, None))
+
+    def test_tokens_of_other_purposes_are_rejected(self):
+        token = TokenSerializer("secret", "antiforgery").dumps("s", "value")
+        self.assertEqual(self.serializer.loads(token), (None, None))
+
+
+class LegacyCookieTestCase(unittest.TestCase):
+    """
+    Session cookies encrypted with AES by previous versions are still accepted, if configured.
+    """
+    def setUp(self):
+        from core.encryption.aes import AesEncryptor
+        from app.handlers.areas import Area
+        self.encrypt = AesEncryptor.encrypt
+        self.read_legacy_cookie = Area._read_legacy_cookie
+
+    def get_area(self, accept_legacy_cookies=True):
+        return SimpleNamespace(accept_legacy_cookies=accept_legacy_cookies,
+                               config=SimpleNamespace(encryption_key="LOREM_IPSUM"))
+
+    def test_legacy_cookie_is_decrypted(self):
+        cookie = self.encrypt("f4b6a1e2-0000-11e6-8000-000000000000", "LOREM_IPSUM").decode("ascii")
+        self.assertEqual(self.read_legacy_cookie(self.get_area(), cookie), "f4b6a1e2-0000-11e6-8000-000000000000")
+
+    def test_legacy_cookie_with_other_key_is_rejected(self):
+        cookie = self.encrypt("f4b6a1e2-0000-11e6-8000-000000000000", "OTHER_KEY").decode("ascii")
+        self.assertIsNone(self.read_legacy_cookie(self.get_area(), cookie))
+
+    def test_legacy_cookie_without_guid_is_rejected(self):
+        # values that are not guids must not reach the database, where the guid column is a UUID
+        cookie = self.encrypt("not a guid", "LOREM_IPSUM").decode("ascii")
+        self.assertIsNone(self.read_legacy_cookie(self.get_area(), cookie))
+
+    def test_garbage_is_rejected(self):
+        self.assertIsNone(self.read_legacy_cookie(self.get_area(), "bG9yZW0gaXBzdW0gZG9sb3Igc2l0IGFtZXQ="))
+
+    def test_legacy_cookies_can_be_disabled(self):
+        cookie = self.encrypt("f4b6a1e2-0000-11e6-8000-000000000000", "LOREM_IPSUM").decode("ascii")
+        self.assertIsNone(self.read_legacy_cookie(self.get_area(accept_legacy_cookies=False), cookie))
+
+    def test_tokens_are_not_decrypted(self):
+        token = TokenSerializer("LOREM_IPSUM", "session-cookie").dumps("s", "value")
+        self.assertIsNone(self.read_legacy_cookie(self.get_area(), token))
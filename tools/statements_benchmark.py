@@ -0,0 +1,55 @@
+"""
+ This script compares the per-call cost of building and compiling the hot statements of the membership store, as done
+ by aiopg.sa for SQLAlchemy expressions, with the cost of executing statements compiled once by
+ dal.statements.prepare_statements.
+
+ Usage (from the root folder of the project):
+    python tools/statements_benchmark.py [number]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlalchemy as sa
+from dal.statements import dialect
+from dal.public.membership import PublicMembershipStore
+
+
+def build_and_compile(expressions, name, values):
+    # what happens at every call, when SQLAlchemy expressions are passed to aiopg.sa:
+    # binding the values clones the expression, which is then compiled
+    statement = expressions[name].params(**values)
+    compiled = statement.compile(dialect=dialect)
+    return str(compiled), compiled.construct_params()
+
+
+def precompiled(store_type, name, values):
+    statement = store_type.statements[name]
+    return statement.sql, statement.params(**values)
+
+
+def main(number=10000):
+    store_type = PublicMembershipStore
+    expressions = store_type.get_statements()
+    cases = [
+        ("get_account", {"account_id": 1}),
+        ("get_account_by_key", {"userkey": "someone@example.com"}),
+        ("get_session", {"session_id": 1}),
+        ("get_session_by_guid", {"session_guid": "f4b6a1e2-0000-11e6-8000-000000000000"}),
+        ("get_session_and_account", {"session_guid": "f4b6a1e2-0000-11e6-8000-000000000000"})
+    ]
+    print("SQLAlchemy {}, {} calls per statement".format(sa.__version__, number))
+    print("{:<26}{:>16}{:>16}{:>10}".format("statement", "compiled (us)", "prepared (us)", "ratio"))
+    for name, values in cases:
+        before = timeit.timeit(lambda: build_and_compile(expressions, name, values), number=number)
+        after = timeit.timeit(lambda: precompiled(store_type, name, values), number=number)
+        print("{:<26}{:>16.2f}{:>16.2f}{:>10.1f}".format(name,
+                                                       before * 1e6 / number,
+                                                       after * 1e6 / number,
+                                                       before / after))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)